@@ -0,0 +1,289 @@
+import os
+import sys
+import time
+import struct
+import socket
+import asyncio
+import threading
+import tracemalloc
+import mss.tools
+from VNC import VNC
+from VNC import Encoder
+from VNC import HTTP
+from VNC import Input
+
+def Build_Screen(Width, Height):
+    Raw = bytearray(Width * Height * 4)
+    Stride = Width * 4
+    for Y in range(0, Height, 8):
+        Row_Start = Y * Stride
+        for X in range(0, Width, 40):
+            Raw[Row_Start + X * 4:Row_Start + X * 4 + 64] = bytes(((X + Y + Index) * 7) & 0xFF for Index in range(64))
+    return Raw
+
+def Message_Length(Message):
+    if isinstance(Message, (bytes, bytearray, memoryview)):
+        return len(Message)
+    return sum(len(Part) for Part in Message)
+
+def Measure(Function, *Args):
+    tracemalloc.reset_peak()
+    Base = tracemalloc.get_traced_memory()[0]
+    Result = Function(*Args)
+    return Result, max(0, tracemalloc.get_traced_memory()[1] - Base)
+
+def Send_Frame(Frame_Socket, Client, Message):
+    Views = [memoryview(Part) for Part in Frame_Socket._Frame_Parts(0x2, Message) if len(Part)]
+    return Frame_Socket._Write_Parts(Client, Views, 0)[1]
+
+def Legacy_Build_Frame_Message(Frame_Encoder, Raw, Width, Height, Rects):
+    Stride = Width * 4
+    Message = struct.pack("!BBHHH", 1, Frame_Encoder.Format, Width, Height, len(Rects))
+    for X, Y, Rect_Width, Rect_Height in Rects:
+        if Frame_Encoder.Format == Encoder.PNG.Format:
+            Region = b"".join(Raw[(Y + Row) * Stride + X * 4:(Y + Row) * Stride + (X + Rect_Width) * 4] for Row in range(Rect_Height))
+            Rgb = bytearray(Rect_Width * Rect_Height * 3)
+            Rgb[0::3] = Region[2::4]
+            Rgb[1::3] = Region[1::4]
+            Rgb[2::3] = Region[0::4]
+            Data = mss.tools.to_png(bytes(Rgb), (Rect_Width, Rect_Height))
+        else:
+            Data = b"".join(Frame_Encoder.Encode(Raw, Width, Height, X, Y, Rect_Width, Rect_Height))
+        Message = Message + struct.pack("!HHHHI", X, Y, Rect_Width, Rect_Height, len(Data)) + Data
+    return Message
+
+def Legacy_Send_Frame(Frame_Socket, Client, Message):
+    Length = len(Message)
+    if Length < 126:
+        Header = struct.pack("!BB", 0x82, Length)
+    elif Length < (1 << 16):
+        Header = struct.pack("!BBH", 0x82, 126, Length)
+    else:
+        Header = struct.pack("!BBQ", 0x82, 127, Length)
+    Client.sendall(Header + Message)
+    return Length
+
+def Drain(Reader):
+    Buffer = bytearray(1 << 20)
+    try:
+        while Reader.recv_into(Buffer):
+            pass
+    except Exception:
+        pass
+
+def Run(Width=1920, Height=1080, Clients=4, Rounds=10, Format="png"):
+    Server = VNC(IP="127.0.0.1", Port=0, VNC_Port=0, Frame_Format=Format, Adaptive=False)
+    Frame_Encoder = Encoder.Create(Format)
+    Raw = Build_Screen(Width, Height)
+    Cases = [("Key_Frame", [(0, 0, Width, Height)]), ("Tile_Update", [(128, 128, 256, 64), (640, 512, 64, 64)])]
+    Paths = [("Legacy", Legacy_Build_Frame_Message, Legacy_Send_Frame), ("Current", Server._Build_Frame_Message, Send_Frame)]
+    Pairs = [socket.socketpair() for Index in range(Clients)]
+    for Writer, Reader in Pairs:
+        threading.Thread(target=Drain, args=(Reader,), daemon=True).start()
+    Results = []
+    for Case_Name, Rects in Cases:
+        for Path_Name, Build, Send in Paths:
+            Message = Build(Frame_Encoder, Raw, Width, Height, Rects)
+            for Writer, Reader in Pairs:
+                Send(Server._Socket, Writer, Message)
+            tracemalloc.start()
+            Message, Encode_Copied = Measure(Build, Frame_Encoder, Raw, Width, Height, Rects)
+            Send_Copied = 0
+            for Writer, Reader in Pairs:
+                Sent, Copied = Measure(Send, Server._Socket, Writer, Message)
+                Send_Copied += Copied
+            tracemalloc.stop()
+            Start = time.perf_counter()
+            for Round in range(Rounds):
+                Message = Build(Frame_Encoder, Raw, Width, Height, Rects)
+            Encode_Time = (time.perf_counter() - Start) / Rounds
+            Start = time.perf_counter()
+            for Round in range(Rounds):
+                for Writer, Reader in Pairs:
+                    Send(Server._Socket, Writer, Message)
+            Send_Time = (time.perf_counter() - Start) / Rounds
+            Pixel_Bytes = sum(Rect[2] * Rect[3] * 4 for Rect in Rects)
+            Results.append({"Case": Case_Name, "Path": Path_Name, "Pixel_Bytes": Pixel_Bytes, "Message_Bytes": Message_Length(Message), "Encode_Copied": Encode_Copied, "Send_Copied": Send_Copied, "Encode_Time": Encode_Time, "Send_Time": Send_Time})
+    for Writer, Reader in Pairs:
+        Writer.close()
+        Reader.close()
+    return Results
+
+def Print_Results(Results, Clients):
+    print(f"{'Case':<12} {'Path':<8} {'Pixels':>10} {'Message':>10} {'Encode Copied':>14} {'Send Copied':>12} {'Encode ms':>10} {'Send ms':>8}")
+    for Result in Results:
+        print(f"{Result['Case']:<12} {Result['Path']:<8} {Result['Pixel_Bytes']:>10} {Result['Message_Bytes']:>10} {Result['Encode_Copied']:>14} {Result['Send_Copied']:>12} {Result['Encode_Time'] * 1000:>10.2f} {Result['Send_Time'] * 1000:>8.2f}")
+    print(f"Copied columns are bytes newly allocated per frame as traced by tracemalloc, send is summed over {Clients} clients.")
+    print("Legacy is the previous path, mss.tools.to_png for PNG with joined bytes messages and one sendall of header plus message per client.")
+
+def Build_Client_Frames(Payload, Count):
+    Frames = []
+    for Index in range(Count):
+        Mask = os.urandom(4)
+        Length = len(Payload)
+        if Length < 126:
+            Header = struct.pack("!BB", 0x82, 0x80 | Length)
+        elif Length < (1 << 16):
+            Header = struct.pack("!BBH", 0x82, 0x80 | 126, Length)
+        else:
+            Header = struct.pack("!BBQ", 0x82, 0x80 | 127, Length)
+        Frames.append(Header + Mask + HTTP.Frame_Reader.Unmask(Payload, Mask))
+    return b"".join(Frames)
+
+def Legacy_Recv_Exact(Client, Count):
+    Data = b""
+    while len(Data) < Count:
+        Chunk = Client.recv(Count - len(Data))
+        if not Chunk:
+            return None
+        Data += Chunk
+    return Data
+
+def Legacy_Decode_Frame(Client):
+    Header = Legacy_Recv_Exact(Client, 2)
+    if not Header:
+        return None
+    Byte1, Byte2 = Header[0], Header[1]
+    Op = Byte1 & 0x0F
+    Length = Byte2 & 0x7F
+    if Length == 126:
+        Length = struct.unpack("!H", Legacy_Recv_Exact(Client, 2))[0]
+    elif Length == 127:
+        Length = struct.unpack("!Q", Legacy_Recv_Exact(Client, 8))[0]
+    Mask = b""
+    if (Byte2 >> 7) & 1:
+        Mask = Legacy_Recv_Exact(Client, 4)
+    Payload = Legacy_Recv_Exact(Client, Length)
+    if Mask:
+        Payload = bytes(B ^ Mask[i % 4] for i, B in enumerate(Payload))
+    return (Op, Payload)
+
+def Run_Codec(Payload_Size, Count):
+    Payload = os.urandom(Payload_Size)
+    Data = Build_Client_Frames(Payload, Count)
+    Results = {}
+    for Codec_Name in ("Legacy", "Frame_Reader"):
+        Writer, Reader = socket.socketpair()
+        Sender = threading.Thread(target=Writer.sendall, args=(Data,), daemon=True)
+        Start = time.perf_counter()
+        Sender.start()
+        if Codec_Name == "Legacy":
+            for Index in range(Count):
+                Frame = Legacy_Decode_Frame(Reader)
+                assert Frame[1] == Payload
+        else:
+            Reader.setblocking(False)
+            Loop = asyncio.SelectorEventLoop()
+            async def Read_All():
+                Frame_Reader = HTTP.Frame_Reader(Loop, Reader, Max_Message_Size=max(Payload_Size, 125))
+                for Index in range(Count):
+                    Frame = await Frame_Reader.Read()
+                    assert Frame[1] == Payload
+            Loop.run_until_complete(Read_All())
+            Loop.close()
+        Elapsed = time.perf_counter() - Start
+        Sender.join()
+        Writer.close()
+        Reader.close()
+        Results[Codec_Name] = Elapsed / Count
+    return Results
+
+def Print_Codec_Results():
+    print(f"{'Message':<12} {'Legacy us':>12} {'Frame_Reader us':>16} {'Speedup':>8}")
+    for Case_Name, Payload_Size, Count in (("100 B", 100, 20000), ("1 MB", 1000000, 5)):
+        Results = Run_Codec(Payload_Size, Count)
+        print(f"{Case_Name:<12} {Results['Legacy'] * 1e6:>12.1f} {Results['Frame_Reader'] * 1e6:>16.1f} {Results['Legacy'] / Results['Frame_Reader']:>8.1f}")
+
+def Wait_Flushed(Frame_Socket, Clients):
+    while any((Frame_Socket.Client_Stats(Client) or {}).get("Backlog", 0) for Client in Clients):
+        time.sleep(0.0005)
+
+def Run_Fanout(Viewer_Counts=(1, 10, 50, 200), Width=1920, Height=1080, Format="png"):
+    Server = VNC(IP="127.0.0.1", Port=0, VNC_Port=0, Frame_Format=Format, Adaptive=False)
+    Frame_Encoder = Encoder.Create(Format)
+    Message = Server._Build_Frame_Message(Frame_Encoder, Build_Screen(Width, Height), Width, Height, [(0, 0, Width, Height)])
+    Frame_Socket = HTTP.Socket(0, IP="127.0.0.1", Queue_Size=4)
+    Frame_Socket.Start()
+    Results = []
+    for Viewer_Count in Viewer_Counts:
+        Pairs = [socket.socketpair() for Index in range(Viewer_Count)]
+        Clients = []
+        for Writer, Reader in Pairs:
+            Writer.setblocking(False)
+            threading.Thread(target=Drain, args=(Reader,), daemon=True).start()
+            Frame_Socket._Loop.call_soon_threadsafe(Frame_Socket._Add_Client, Writer)
+            Clients.append(Writer)
+        while len(Frame_Socket._Clients) < Viewer_Count:
+            time.sleep(0.001)
+        Row = {"Viewers": Viewer_Count}
+        for Mode in ("Send", "Broadcast"):
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            Base = tracemalloc.get_traced_memory()[0]
+            Start = time.perf_counter()
+            if Mode == "Send":
+                for Client in Clients:
+                    Frame_Socket.Send(Client, Message, Replace_Key="Frame")
+            else:
+                Frame_Socket.Broadcast(Clients, Message, Replace_Key="Frame")
+            Row[Mode + "_Time"] = time.perf_counter() - Start
+            Row[Mode + "_Copied"] = max(0, tracemalloc.get_traced_memory()[1] - Base)
+            tracemalloc.stop()
+            Wait_Flushed(Frame_Socket, Clients)
+        Results.append(Row)
+        for Client in Clients:
+            Frame_Socket.Close_Client(Client)
+        for Writer, Reader in Pairs:
+            Reader.close()
+    Frame_Socket.Close()
+    return Message_Length(Message), Results
+
+def Print_Fanout_Results():
+    Frame_Bytes, Results = Run_Fanout()
+    print(f"Frame of {Frame_Bytes} bytes")
+    print(f"{'Viewers':>8} {'Send Copied':>12} {'Send ms':>8} {'Broadcast Copied':>17} {'Broadcast ms':>13}")
+    for Row in Results:
+        print(f"{Row['Viewers']:>8} {Row['Send_Copied']:>12} {Row['Send_Time'] * 1000:>8.2f} {Row['Broadcast_Copied']:>17} {Row['Broadcast_Time'] * 1000:>13.2f}")
+
+def Run_Input(Events=2000):
+    Results = []
+    for Backend_Name in ("xtest", "pyautogui"):
+        try:
+            Backend = Input.XTEST() if Backend_Name == "xtest" else Input.PYAUTOGUI()
+            Width, Height = Backend.Size()
+        except Exception as Error:
+            Results.append({"Backend": Backend_Name, "Error": str(Error)})
+            continue
+        Latencies = []
+        Start = time.perf_counter()
+        for Index in range(Events):
+            Event_Start = time.perf_counter()
+            Backend.Move(Index % Width, (Index * 7) % Height)
+            Latencies.append(time.perf_counter() - Event_Start)
+        Elapsed = time.perf_counter() - Start
+        Backend.Close()
+        Latencies.sort()
+        Results.append({"Backend": Backend_Name, "Events_Per_Second": Events / Elapsed, "Average": sum(Latencies) / Events, "P50": Latencies[Events // 2], "P99": Latencies[min(Events - 1, Events * 99 // 100)]})
+    return Results
+
+def Print_Input_Results():
+    print(f"{'Backend':<10} {'Events/s':>10} {'Avg us':>8} {'P50 us':>8} {'P99 us':>8}")
+    for Result in Run_Input():
+        if "Error" in Result:
+            print(f"{Result['Backend']:<10} unavailable: {Result['Error']}")
+            continue
+        print(f"{Result['Backend']:<10} {Result['Events_Per_Second']:>10.0f} {Result['Average'] * 1e6:>8.1f} {Result['P50'] * 1e6:>8.1f} {Result['P99'] * 1e6:>8.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "codec":
+        Print_Codec_Results()
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "fanout":
+        Print_Fanout_Results()
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "input":
+        Print_Input_Results()
+        sys.exit(0)
+    Format_Name = sys.argv[1] if len(sys.argv) > 1 else "png"
+    Client_Count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    Print_Results(Run(Clients=Client_Count, Format=Format_Name), Client_Count)
@@ -4,60 +4,109 @@ import json
 import shutil
 import socket
 import hashlib
+import secrets
 import threading
 import ssl
 import select
+import queue
+import asyncio
+import collections
 import base64
 import struct
 import urllib.request
 import urllib.parse
+import zlib
+import math
+import io
+import multiprocessing
+import multiprocessing.connection
+import ctypes
+import ctypes.util
 from http.server import CGIHTTPRequestHandler
 from http.server import ThreadingHTTPServer
 import mss
-import mss.tools
 import pyautogui
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
 
 class VNC:
+
+    Input_Actions = ("move", "down", "up", "click", "press")
+    Input_Buttons = ("left", "right", "middle")
+    Input_Tag_Timeout = 2.0
     
-    def __init__(self, IP='', Port=8080, VNC_Port=5900, Web_Root="Localhost", Capture_Interval=0.02, Callback=None):
+    def __init__(self, IP='', Port=8080, VNC_Port=5900, Web_Root="Localhost", Capture_Interval=0.02, Callback=None, Tile_Size=64, Keep_Alive_Interval=5.0, Frame_Format="png", Frame_Quality=80, Png_Level=6, Png_Strategy="default", Adaptive=True, Idle_Interval=0.5, Encode_Workers=0, Deflate=False, Deflate_Context_Takeover=True, Socket_Workers=0, Upstream=None, Upstream_User="", Upstream_Password="", Resume_Ttl=30.0, Max_Clients=0, Retry_After=5.0, Input_Backend="auto"):
         self._IP = IP
         self._Port = Port
         self._VNC_Port = VNC_Port
         self._Capture_Interval = Capture_Interval
+        self._Tile_Size = max(0, int(Tile_Size or 0))
+        self._Keep_Alive_Interval = float(Keep_Alive_Interval or 0)
+        self._Monitor_Frames = {}
+        self._Frame_Format = str(Frame_Format or "png").lower()
+        if self._Frame_Format not in Encoder.Formats or Image is None:
+            self._Frame_Format = "png"
+        self._Frame_Quality = max(1, min(100, int(Frame_Quality)))
+        self._Png_Level = max(0, min(9, int(Png_Level)))
+        self._Png_Strategy = str(Png_Strategy or "default").lower()
+        self._Encoders = {}
+        self._Adaptive = bool(Adaptive)
+        self._Pacer = Frame_Pacer(self._Capture_Interval, Idle_Interval)
+        self._Encode_Pool = Encode_Pool(Encode_Workers)
         self._Web_Root = Web_Root
         self._Http_Server = HTTP.Server(self._Port, IP=self._IP)
-        self._Socket = HTTP.Socket(self._VNC_Port, IP=self._IP)
+        if int(Socket_Workers or 0) > 0 and Shard_Socket.Supported():
+            self._Socket = Shard_Socket(self._VNC_Port, IP=self._IP, Workers=Socket_Workers, Deflate=Deflate, Context_Takeover=Deflate_Context_Takeover, Max_Clients=Max_Clients, Retry_After=Retry_After)
+        else:
+            self._Socket = HTTP.Socket(self._VNC_Port, IP=self._IP, Deflate=Deflate, Context_Takeover=Deflate_Context_Takeover, Max_Clients=Max_Clients, Retry_After=Retry_After)
         self._Running = False
         self._Http_Thread = None
         self._Receive_Thread = None
         self._Capture_Thread = None
         self._Mouse_Thread = None
-        self._Mouse_Lock = threading.Lock()
-        self._Mouse_Has_State = False
-        self._Mouse_Down = False
-        self._Mouse_Button = "left"
+        self._Mouse_Condition = threading.Condition()
+        self._Mouse_Moved = False
         self._Mouse_X = 0.0
         self._Mouse_Y = 0.0
-        self._Mouse_Prev_Down = False
-        self._Mouse_Prev_X = None
-        self._Mouse_Prev_Y = None
+        self._Mouse_Buttons = collections.deque()
+        self._Mouse_Stamp = None
+        self._Input_Latency = collections.deque(maxlen=1000)
+        self._Input_Server_Latency = collections.deque(maxlen=1000)
+        self._Input_Unchanged_Latency = collections.deque(maxlen=1000)
+        self._Input_Unchanged_Server_Latency = collections.deque(maxlen=1000)
         self._Monitor_Lock = threading.Lock()
         self._Monitor_Count = 1
         self._Active_Monitor_Index = 1
+        self._Input = Input.Create(Input_Backend)
         try:
-            self._Screen_Size = pyautogui.size()
+            self._Screen_Size = self._Input.Size()
         except Exception:
             self._Screen_Size = None
         self._Users = {}
-        self._Clients_Info = {}
-        self._Controller_User_Key = None
-        self._Controller_User = None
+        self._Sessions = Session_Registry()
         self._Callback = Callback
+        self._Resume_Ttl = max(0.0, float(Resume_Ttl or 0))
+        self._Resume_Tokens = {}
+        self._Resume_Lock = threading.Lock()
+        self._First_Frame = {"Count": 0, "Cached": 0, "Total": 0.0, "Max": 0.0, "Last": None}
+        self._Upstream_Url = Upstream or None
+        self._Upstream_User = str(Upstream_User or "")
+        self._Upstream_Password = str(Upstream_Password or "")
+        self._Upstream = None
+        self._Relay_Thread = None
+        self._Relay_State = {"Connected": False, "Control_Allowed": False, "Control": False, "Control_Requested": 0.0, "Refresh_Requested": 0.0, "Frames": 0, "Bytes": 0, "Reconnects": 0, "Retry_After": 0.0}
 
     def Start(self):
         self._Prepare_Web_Root()
         self._Http_Server.Root(self._Web_Root)
         self._Http_Server.CORS("*")
+        self._Encode_Pool.Start()
         try:
             with mss.mss() as Screen_Capture:
                 Monitors = Screen_Capture.monitors
@@ -77,10 +126,14 @@ class VNC:
         self._Running = True
         self._Receive_Thread = threading.Thread(target=self._Receive_Loop, daemon=True)
         self._Receive_Thread.start()
-        self._Capture_Thread = threading.Thread(target=self._Capture_Loop, daemon=True)
-        self._Capture_Thread.start()
-        self._Mouse_Thread = threading.Thread(target=self._Mouse_Loop, daemon=True)
-        self._Mouse_Thread.start()
+        if self._Upstream_Url:
+            self._Relay_Thread = threading.Thread(target=self._Relay_Loop, daemon=True)
+            self._Relay_Thread.start()
+        else:
+            self._Capture_Thread = threading.Thread(target=self._Capture_Loop, daemon=True)
+            self._Capture_Thread.start()
+            self._Mouse_Thread = threading.Thread(target=self._Mouse_Loop, daemon=True)
+            self._Mouse_Thread.start()
         self._Run_Forever()
 
     def Stop(self):
@@ -93,6 +146,15 @@ class VNC:
             self._Socket.Close()
         except Exception:
             pass
+        try:
+            self._Encode_Pool.Close()
+        except Exception:
+            pass
+        with self._Mouse_Condition:
+            self._Mouse_Condition.notify_all()
+        Upstream = self._Upstream
+        if Upstream is not None:
+            Upstream.Close()
 
     def Add(self, Username, Password, Control):
         Username_Text = str(Username or "").strip()
@@ -102,6 +164,7 @@ class VNC:
         Password_Text = str(Password or "")
         Control_Flag = bool(Control)
         self._Users[Username_Key] = {"Password": Password_Text, "Control": Control_Flag}
+        self._Revoke_Resume_Tokens(Username_Key)
         return True
 
     def Remove(self, Username):
@@ -111,21 +174,41 @@ class VNC:
         Username_Key = Username_Text.lower()
         if Username_Key in self._Users:
             del self._Users[Username_Key]
-        Clients_To_Close = []
-        for Client, Info in list(self._Clients_Info.items()):
-            if Info.get("User_Key") == Username_Key:
-                Clients_To_Close.append(Client)
-                del self._Clients_Info[Client]
-        for Client in Clients_To_Close:
+        self._Revoke_Resume_Tokens(Username_Key)
+        for Session in self._Sessions.Close_User(Username_Key):
             try:
-                self._Socket.Close_Client(Client)
+                self._Socket.Close_Client(Session.Client)
             except Exception:
                 pass
-        if self._Controller_User_Key == Username_Key:
-            self._Controller_User_Key = None
-            self._Controller_User = None
+        if self._Sessions.Controller_Key == Username_Key:
+            self._Sessions.Set_Controller(None, None)
         return True
 
+    def Stats(self):
+        Monitors = {}
+        for Monitor_Index, Frame_State in list(self._Monitor_Frames.items()):
+            Monitors[Monitor_Index] = {
+                "Frames_Sent": Frame_State["Frames_Sent"],
+                "Frames_Skipped": Frame_State["Frames_Skipped"],
+                "Keep_Alive_Sent": Frame_State["Keep_Alive_Sent"],
+                "Frames_Dropped": Frame_State["Frames_Dropped"],
+                "Cache_Hits": Frame_State["Cache_Hits"]
+            }
+        Clients = []
+        for Session in self._Sessions.Viewers():
+            Client_Stats = {"User": Session.User, "Monitor": Session.Monitor_Index, "First_Frame": Session.First_Frame, "Input_Latency": self._Latency_Stats(Session.Input_Latency or ())}
+            Link = Session.Link
+            if Link is not None:
+                Client_Stats.update(Link.Stats())
+            Clients.append(Client_Stats)
+        First_Frame = self._First_Frame
+        First_Frame_Stats = {"Count": First_Frame["Count"], "Cached": First_Frame["Cached"], "Average": First_Frame["Total"] / First_Frame["Count"] if First_Frame["Count"] else None, "Max": First_Frame["Max"], "Last": First_Frame["Last"]}
+        Input_Stats = {"Backend": self._Input.Name, "Latency": self._Latency_Stats(self._Input_Latency), "Server_Latency": self._Latency_Stats(self._Input_Server_Latency), "Unchanged_Latency": self._Latency_Stats(self._Input_Unchanged_Latency), "Unchanged_Server_Latency": self._Latency_Stats(self._Input_Unchanged_Server_Latency)}
+        Result = {"Monitors": Monitors, "Clients": Clients, "Capture": self._Pacer.Stats(), "Encode": self._Encode_Pool.Stats(), "Transport": self._Socket.Stats(), "First_Frame": First_Frame_Stats, "Input": Input_Stats}
+        if self._Upstream_Url:
+            Result["Relay"] = {"Upstream": self._Upstream_Url, "Connected": self._Relay_State["Connected"], "Control": self._Relay_State["Control"], "Frames": self._Relay_State["Frames"], "Bytes": self._Relay_State["Bytes"], "Reconnects": self._Relay_State["Reconnects"]}
+        return Result
+
     def _Receive_Loop(self):
         Client = None
         while self._Running:
@@ -137,29 +220,29 @@ class VNC:
             if Client is None:
                 continue
             if Payload is None:
-                Info = self._Clients_Info.pop(Client, None)
-                if Info:
-                    User_Name = Info.get("User") or ""
-                    User_Key = Info.get("User_Key") or ""
+                Session = self._Sessions.Close(Client)
+                if Session:
+                    self._Park_Session(Session)
+                    User_Name = Session.User
+                    User_Key = Session.User_Key or ""
                     self._Emit_Event({"Event": "Disconnect", "User": User_Name, "User_Key": User_Key})
-                    if Info.get("Has_Control"):
-                        Controller_User_Key = Info.get("User_Key")
-                        if Controller_User_Key and Controller_User_Key == self._Controller_User_Key:
-                            Controller_Alive = False
-                            for Client_Id, Client_Info in list(self._Clients_Info.items()):
-                                if Client_Info.get("User_Key") == Controller_User_Key and Client_Info.get("Authenticated") and Client_Info.get("Control_Allowed") and Client_Info.get("Has_Control"):
-                                    Controller_Alive = True
-                                    break
-                            if not Controller_Alive:
-                                self._Controller_User_Key = None
-                                self._Controller_User = None
+                    if Session.Has_Control:
+                        Controller_User_Key = Session.User_Key
+                        if Controller_User_Key and Controller_User_Key == self._Sessions.Controller_Key:
+                            if not self._Sessions.Controllers():
+                                self._Sessions.Set_Controller(None, None)
                                 self._Emit_Event({"Event": "Control_Change", "Type": "Disconnect", "User": User_Name, "User_Key": Controller_User_Key})
                 Client = None
                 continue
-            try:
-                Message = json.loads(Payload)
-            except Exception:
-                continue
+            if isinstance(Payload, str):
+                try:
+                    Message = json.loads(Payload)
+                except Exception:
+                    continue
+            else:
+                Message = self._Decode_Input(Payload)
+                if Message is None:
+                    continue
             Message_Type = Message.get("Type")
             try:
                 if Message_Type == "Login":
@@ -170,14 +253,22 @@ class VNC:
                     self._Handle_Control_Release(Message, Client)
                 elif Message_Type == "Click":
                     self._Handle_Click(Message, Client)
+                elif Message_Type == "Input_Latency":
+                    self._Handle_Input_Latency(Message, Client)
                 elif Message_Type == "Monitor_Select":
                     self._Handle_Monitor_Select(Message, Client)
                 elif Message_Type == "Hello":
-                    self._Send_Monitor_Info(Client)
+                    self._Handle_Hello(Message, Client)
+                elif Message_Type == "Viewport":
+                    self._Handle_Viewport(Message, Client)
                 elif Message_Type == "Key":
                     self._Handle_Key(Message, Client)
                 elif Message_Type == "Key_Combo":
                     self._Handle_Key_Combo(Message, Client)
+                elif Message_Type == "Refresh":
+                    self._Handle_Refresh(Message, Client)
+                elif Message_Type == "Resume":
+                    self._Handle_Resume(Message, Client)
             except Exception:
                 continue
 
@@ -192,6 +283,28 @@ class VNC:
         except Exception:
             pass
 
+    def _Decode_Input(self, Payload):
+        try:
+            Input_Type = Payload[0]
+            if Input_Type == 1:
+                Action, Button, X, Y, Seq, Client_Time = struct.unpack_from("!BBHHII", Payload, 1)
+                return {"Type": "Click", "X": X / 65535.0, "Y": Y / 65535.0, "Button": self.Input_Buttons[Button], "Action": self.Input_Actions[Action], "Seq": Seq, "Time": Client_Time}
+            if Input_Type == 2:
+                Action, Seq, Client_Time, Length = struct.unpack_from("!BIIB", Payload, 1)
+                return {"Type": "Key", "Action": self.Input_Actions[Action], "Key": bytes(Payload[11:11 + Length]).decode("utf-8"), "Seq": Seq, "Time": Client_Time}
+            if Input_Type == 3:
+                Seq, Client_Time, Count = struct.unpack_from("!IIB", Payload, 1)
+                Keys = []
+                Offset = 10
+                for Index in range(Count):
+                    Length = Payload[Offset]
+                    Keys.append(bytes(Payload[Offset + 1:Offset + 1 + Length]).decode("utf-8"))
+                    Offset += 1 + Length
+                return {"Type": "Key_Combo", "Keys": Keys, "Seq": Seq, "Time": Client_Time}
+        except Exception:
+            return None
+        return None
+
     def _Normalize_Key_Name(self, Key_Value):
         if Key_Value is None:
             return None
@@ -243,25 +356,29 @@ class VNC:
         Key_Name = self._Normalize_Key_Name(Key_Value)
         if Key_Name is None:
             return
-        Info = self._Clients_Info.get(Client)
-        if Info:
-            User_Name = Info.get("User") or ""
-            User_Key = Info.get("User_Key") or ""
+        Session = self._Sessions.Get(Client)
+        if Session:
+            User_Name = Session.User
+            User_Key = Session.User_Key or ""
             self._Emit_Event({"Event": "Key", "User": User_Name, "User_Key": User_Key, "Action": Action, "Key": Key_Name, "Raw_Key": Key_Value})
+        if self._Upstream_Url:
+            self._Relay_Forward(Message)
+            return
         Special_Press_Keys = {"win", "alt", "shift"}
         try:
             if Key_Name in Special_Press_Keys:
                 if Action == "down" or Action == "press":
-                    pyautogui.press(Key_Name)
-                return
-            if Action == "down":
-                pyautogui.keyDown(Key_Name)
+                    self._Input.Press(Key_Name)
+            elif Action == "down":
+                self._Input.Key(Key_Name, True)
             elif Action == "up":
-                pyautogui.keyUp(Key_Name)
+                self._Input.Key(Key_Name, False)
             elif Action == "press":
-                pyautogui.press(Key_Name)
+                self._Input.Press(Key_Name)
         except Exception:
             return
+        self._Stamp_Input(Session, Message)
+        self._Pacer.Wake()
 
     def _Handle_Key_Combo(self, Message, Client):
         if not self._Client_Has_Control(Client):
@@ -276,20 +393,23 @@ class VNC:
                 Keys_Normalized.append(Key_Name)
         if not Keys_Normalized:
             return
-        Info = self._Clients_Info.get(Client)
-        if Info:
-            User_Name = Info.get("User") or ""
-            User_Key = Info.get("User_Key") or ""
+        Session = self._Sessions.Get(Client)
+        if Session:
+            User_Name = Session.User
+            User_Key = Session.User_Key or ""
             self._Emit_Event({"Event": "Key_Combo", "User": User_Name, "User_Key": User_Key, "Keys": list(Keys_Normalized)})
+        if self._Upstream_Url:
+            self._Relay_Forward(Message)
+            return
         try:
             if Keys_Normalized == ["shift", "delete"] or Keys_Normalized == ["delete", "shift"]:
-                pyautogui.keyDown("shift")
-                pyautogui.press("delete")
-                pyautogui.keyUp("shift")
+                self._Input.Hotkey(["shift", "delete"])
             else:
-                pyautogui.hotkey(*Keys_Normalized)
+                self._Input.Hotkey(Keys_Normalized)
         except Exception:
             return
+        self._Stamp_Input(Session, Message)
+        self._Pacer.Wake()
 
     def _Handle_Click(self, Message, Client):
         if not self._Client_Has_Control(Client):
@@ -307,24 +427,30 @@ class VNC:
             return
         X_Clamped = max(0.0, min(1.0, X_Val))
         Y_Clamped = max(0.0, min(1.0, Y_Val))
-        Info = self._Clients_Info.get(Client)
-        if Info and Action != "move":
-            User_Name = Info.get("User") or ""
-            User_Key = Info.get("User_Key") or ""
+        Session = self._Sessions.Get(Client)
+        if Session and Action != "move":
+            User_Name = Session.User
+            User_Key = Session.User_Key or ""
             self._Emit_Event({"Event": "Mouse", "User": User_Name, "User_Key": User_Key, "Button": Button_Name, "Action": Action, "X": X_Clamped, "Y": Y_Clamped})
-        with self._Mouse_Lock:
-            self._Mouse_Has_State = True
-            self._Mouse_Button = Button_Name
+        if self._Upstream_Url:
+            self._Relay_Forward(Message)
+            return
+        with self._Mouse_Condition:
+            self._Mouse_Moved = True
             self._Mouse_X = X_Clamped
             self._Mouse_Y = Y_Clamped
-            if Action == "down":
-                self._Mouse_Down = True
-            elif Action == "up":
-                self._Mouse_Down = False
+            if Action == "down" or Action == "up":
+                self._Mouse_Buttons.append((Action == "down", Button_Name, X_Clamped, Y_Clamped))
+            if "Seq" in Message:
+                self._Mouse_Stamp = (Session, Message)
+            self._Mouse_Condition.notify()
+        self._Pacer.Wake()
 
     def _Capture_Loop(self):
+        self._Pacer.Reset()
         with mss.mss() as Screen_Capture:
             while self._Running:
+                self._Pacer.Begin()
                 Monitors = Screen_Capture.monitors
                 if len(Monitors) > 1:
                     Actual_Count = len(Monitors) - 1
@@ -336,97 +462,562 @@ class VNC:
                     if self._Monitor_Count < 1:
                         self._Monitor_Count = 1
                     Monitor_Count_Local = self._Monitor_Count
-                Clients_Snapshot = list(self._Clients_Info.items())
+                Changed = False
+                Deliveries = []
                 for Monitor_Index in range(1, Monitor_Count_Local + 1):
-                    Has_Viewer = False
-                    for Client_Id, Client_Info in Clients_Snapshot:
-                        if not Client_Info.get("Authenticated"):
-                            continue
-                        Monitor_Index_Client = Client_Info.get("Monitor_Index", 1)
-                        if Monitor_Index_Client == Monitor_Index:
-                            Has_Viewer = True
-                            break
-                    if not Has_Viewer:
+                    Viewers = self._Sessions.Viewers(Monitor_Index)
+                    if not Viewers:
                         continue
+                    self._Send_Cached_Frames(Viewers)
+                    if self._Adaptive:
+                        self._Update_Links(Viewers)
                     if len(Monitors) == 1:
                         Monitor = Monitors[0]
                     else:
                         if Monitor_Index >= len(Monitors):
                             continue
                         Monitor = Monitors[Monitor_Index]
+                    self._Tag_Input(Monitor_Index, time.monotonic())
                     try:
                         Sct_Image = Screen_Capture.grab(Monitor)
                     except Exception:
                         continue
+                    Width, Height = Sct_Image.size
+                    if self._Stream_Frame(Monitor_Index, Sct_Image.raw, Width, Height, Viewers, Deliveries):
+                        Changed = True
+                self._Deliver_Frames(Deliveries)
+                self._Ack_Unchanged_Input()
+                self._Pacer.Activity(Changed)
+                self._Pacer.Wait()
+
+    def _Stream_Frame(self, Monitor_Index, Raw, Width, Height, Viewers, Deliveries):
+        Need_Key_Frame = any(Session.Need_Key_Frame for Session in Viewers)
+        Need_Catch_Up = any(Session.Skipped_Rects for Session in Viewers)
+        Now = time.monotonic()
+        Frame_State = self._Monitor_Frames.get(Monitor_Index)
+        if Frame_State is None or Frame_State["Width"] != Width or Frame_State["Height"] != Height:
+            Frame_State = {"Raw": None, "Width": Width, "Height": Height, "Last_Sent": Now, "Scales": {}, "Cache": {}, "Frames_Sent": 0, "Frames_Skipped": 0, "Keep_Alive_Sent": 0, "Frames_Dropped": 0, "Cache_Hits": 0}
+            if Monitor_Index in self._Monitor_Frames:
+                for Counter_Name in ("Frames_Sent", "Frames_Skipped", "Keep_Alive_Sent", "Frames_Dropped", "Cache_Hits"):
+                    Frame_State[Counter_Name] = self._Monitor_Frames[Monitor_Index][Counter_Name]
+            self._Monitor_Frames[Monitor_Index] = Frame_State
+            Rects = None
+            Changed = True
+        elif Raw == Frame_State["Raw"]:
+            if not Need_Key_Frame and not Need_Catch_Up and (self._Keep_Alive_Interval <= 0 or Now - Frame_State["Last_Sent"] < self._Keep_Alive_Interval):
+                Frame_State["Frames_Skipped"] += 1
+                return False
+            Rects = []
+            Changed = False
+            if not Need_Key_Frame and not Need_Catch_Up:
+                Rects = None
+                Frame_State["Keep_Alive_Sent"] += 1
+        else:
+            Rects = self._Find_Dirty_Rects(Frame_State["Raw"], Raw, Width, Height)
+            Changed = Rects is None or len(Rects) > 0
+        Frame_State["Raw"] = Raw
+        if Changed:
+            Frame_State["Cache"] = {}
+        Frame_State["Last_Sent"] = Now
+        Frame_State["Frames_Sent"] += 1
+        Scales = {}
+        for Session in Viewers:
+            Link = Session.Link
+            if Link is not None and Now - Link.Last_Frame < Link.Interval:
+                if Session.Scale_Size is None or (Rects is None and Changed):
+                    Session.Need_Key_Frame = True
+                elif Rects and not Session.Need_Key_Frame:
+                    Session.Skipped_Rects = self._Merge_Rects(Session.Skipped_Rects, self._Scale_Rects(Rects, Width, Height, Session.Scale_Size), Session.Scale_Size[0], Session.Scale_Size[1])
+                if Session.Scale_Size is not None:
+                    Scales.setdefault(Session.Scale_Size, [])
+                continue
+            Scale_Size = self._Client_Scale_Size(Session, Width, Height)
+            if Scale_Size != Session.Scale_Size:
+                Session.Scale_Size = Scale_Size
+                Session.Need_Key_Frame = True
+            Scales.setdefault(Scale_Size, []).append(Session)
+        for Scale_Size in list(Frame_State["Scales"].keys()):
+            if Scale_Size not in Scales:
+                del Frame_State["Scales"][Scale_Size]
+                self._Encode_Pool.Release((Monitor_Index, Scale_Size))
+        for Scale_Size, Scale_Viewers in Scales.items():
+            Buffer_Key = (Monitor_Index, Scale_Size)
+            if Scale_Size == (Width, Height):
+                self._Send_Variants(Frame_State, Raw, Width, Height, Rects, Scale_Viewers, Now, Buffer_Key, Deliveries)
+                continue
+            Scale_State = Frame_State["Scales"].get(Scale_Size)
+            if Scale_State is not None and Rects == []:
+                Scaled_Rects = []
+            else:
+                try:
+                    Scaled_Raw = Encoder.Scale(Raw, Width, Height, Scale_Size[0], Scale_Size[1])
+                except Exception:
+                    continue
+                if Scale_State is None or Rects is None:
+                    Scaled_Rects = None
+                else:
+                    Scaled_Rects = self._Find_Dirty_Rects(Scale_State["Raw"], Scaled_Raw, Scale_Size[0], Scale_Size[1])
+                Scale_State = {"Raw": Scaled_Raw}
+                Frame_State["Scales"][Scale_Size] = Scale_State
+            self._Send_Variants(Frame_State, Scale_State["Raw"], Scale_Size[0], Scale_Size[1], Scaled_Rects, Scale_Viewers, Now, Buffer_Key, Deliveries)
+        return Changed
+
+    def _Client_Scale_Size(self, Session, Width, Height):
+        Factor = 1.0
+        Viewport = Session.Viewport
+        if Viewport is not None and Viewport[2] != "actual":
+            if Viewport[2] == "stretch":
+                Factor = min(1.0, max(Viewport[0] / Width, Viewport[1] / Height))
+            else:
+                Factor = min(1.0, Viewport[0] / Width, Viewport[1] / Height)
+        Link = Session.Link
+        if Link is not None:
+            Factor = Factor / Link.Scale
+        Steps = max(1, min(8, int(math.ceil(Factor * 8 - 0.001))))
+        if Steps == 8:
+            return (Width, Height)
+        return Encoder.Scaled_Size(Width, Height, max(1, Width * Steps // 8), max(1, Height * Steps // 8))
+
+    def _Send_Variants(self, Frame_State, Raw, Width, Height, Rects, Viewers, Now, Buffer_Key, Deliveries):
+        Variants = {}
+        Staged = None
+        for Session in Viewers:
+            if Session.Monitor_Index != Buffer_Key[0]:
+                continue
+            Frame_Encoder = self._Client_Encoder(Session)
+            Variant = Variants.get(Frame_Encoder.Key)
+            if Variant is None:
+                Variant = {"Key_Frame": None, "Update_Frame": None, "Merged": {}}
+                Variants[Frame_Encoder.Key] = Variant
+            Need_Client_Key_Frame = Rects is None or Session.Need_Key_Frame
+            Client_Rects = Rects
+            if Session.Skipped_Rects and not Need_Client_Key_Frame:
+                Client_Rects = self._Merge_Rects(Session.Skipped_Rects, Rects, Width, Height)
+                Need_Client_Key_Frame = Client_Rects == [(0, 0, Width, Height)]
+            if self._Socket.Pending(Session.Client, "Frame"):
+                if not Need_Client_Key_Frame and not Client_Rects:
+                    continue
+                Frame_State["Frames_Dropped"] += 1
+                if not Need_Client_Key_Frame:
+                    Client_Rects = self._Merge_Rects(Session.Queued_Rects, Client_Rects, Width, Height)
+                    Need_Client_Key_Frame = Client_Rects is None or Client_Rects == [(0, 0, Width, Height)]
+            if self._Encode_Pool.Active and Staged is None:
+                try:
+                    Staged = self._Encode_Pool.Stage(Buffer_Key, Raw)
+                except Exception:
+                    continue
+            if Need_Client_Key_Frame:
+                if Variant["Key_Frame"] is None:
                     try:
-                        Frame_Bytes = mss.tools.to_png(Sct_Image.rgb, Sct_Image.size)
+                        Variant["Key_Frame"] = self._Build_Frame_Message(Frame_Encoder, Raw, Width, Height, [(0, 0, Width, Height)], Staged)
                     except Exception:
                         continue
-                    for Client_Id, Client_Info in Clients_Snapshot:
-                        if not Client_Info.get("Authenticated"):
-                            continue
-                        Monitor_Index_Client = Client_Info.get("Monitor_Index", 1)
-                        if Monitor_Index_Client != Monitor_Index:
+                    Frame_State["Cache"][(Buffer_Key[1], Frame_Encoder.Key)] = Variant["Key_Frame"]
+                Frame_Bytes = Variant["Key_Frame"]
+                Session.Need_Key_Frame = False
+                Session.Queued_Rects = None
+                Session.Skipped_Rects = []
+            else:
+                if not Client_Rects:
+                    continue
+                if Client_Rects is Rects:
+                    if Variant["Update_Frame"] is None:
+                        try:
+                            Variant["Update_Frame"] = self._Build_Frame_Message(Frame_Encoder, Raw, Width, Height, Rects, Staged)
+                        except Exception:
                             continue
+                    Frame_Bytes = Variant["Update_Frame"]
+                else:
+                    Frame_Bytes = Variant["Merged"].get(tuple(Client_Rects))
+                    if Frame_Bytes is None:
                         try:
-                            self._Socket.Send(Client_Id, Frame_Bytes)
+                            Frame_Bytes = self._Build_Frame_Message(Frame_Encoder, Raw, Width, Height, Client_Rects, Staged)
                         except Exception:
-                            pass
-                time.sleep(self._Capture_Interval)
+                            continue
+                        Variant["Merged"][tuple(Client_Rects)] = Frame_Bytes
+                Session.Queued_Rects = Client_Rects
+                Session.Skipped_Rects = []
+            Link = Session.Link
+            if Link is not None:
+                Link.Last_Frame = Now
+            Deliveries.append((Session, Frame_Bytes, Buffer_Key[0]))
 
-    def _Mouse_Loop(self):
-        while self._Running:
-            if self._Screen_Size is None:
+    def _Send_Cached_Frames(self, Viewers):
+        Deliveries = []
+        for Session in Viewers:
+            if not Session.Need_Key_Frame:
+                continue
+            Monitor_Index = Session.Monitor_Index
+            Frame_State = self._Monitor_Frames.get(Monitor_Index)
+            if Frame_State is None or Frame_State["Raw"] is None:
+                continue
+            Scale_Size = self._Client_Scale_Size(Session, Frame_State["Width"], Frame_State["Height"])
+            Frame_Encoder = self._Client_Encoder(Session)
+            Cache_Key = (Scale_Size, Frame_Encoder.Key)
+            Frame_Bytes = Frame_State["Cache"].get(Cache_Key)
+            if Frame_Bytes is not None:
+                Frame_State["Cache_Hits"] += 1
+            else:
                 try:
-                    self._Screen_Size = pyautogui.size()
+                    Frame_Bytes = self._Build_Key_Frame(Frame_State, Frame_Encoder, Scale_Size)
                 except Exception:
-                    self._Screen_Size = None
-            with self._Mouse_Lock:
-                Has_State = self._Mouse_Has_State
-                Down = self._Mouse_Down
-                Button = self._Mouse_Button
+                    continue
+                Frame_State["Cache"][Cache_Key] = Frame_Bytes
+            Session.Scale_Size = Scale_Size
+            Session.Need_Key_Frame = False
+            Session.Queued_Rects = None
+            Session.Skipped_Rects = []
+            Deliveries.append((Session, Frame_Bytes, Monitor_Index))
+        if Deliveries:
+            self._Deliver_Frames(Deliveries, True)
+
+    def _Build_Key_Frame(self, Frame_State, Frame_Encoder, Scale_Size):
+        Width = Frame_State["Width"]
+        Height = Frame_State["Height"]
+        Raw = Frame_State["Raw"]
+        if Scale_Size != (Width, Height):
+            Scale_State = Frame_State["Scales"].get(Scale_Size)
+            if Scale_State is not None:
+                Raw = Scale_State["Raw"]
+            else:
+                Raw = Encoder.Scale(Raw, Width, Height, Scale_Size[0], Scale_Size[1])
+        return self._Build_Frame_Message(Frame_Encoder, Raw, Scale_Size[0], Scale_Size[1], [(0, 0, Scale_Size[0], Scale_Size[1])])
+
+    def _Deliver_Frames(self, Deliveries, Cached=False):
+        Groups = {}
+        for Session, Frame_Bytes, Monitor_Index in Deliveries:
+            if Session.Monitor_Index != Monitor_Index:
+                Session.Need_Key_Frame = True
+                continue
+            Group = Groups.get(id(Frame_Bytes))
+            if Group is None:
+                Group = (Frame_Bytes, [])
+                Groups[id(Frame_Bytes)] = Group
+            Group[1].append(Session)
+        for Frame_Bytes, Group_Sessions in Groups.values():
+            if isinstance(Frame_Bytes, Encode_Job):
+                Frame_Bytes = Frame_Bytes.Result()
+                if not Frame_Bytes:
+                    for Session in Group_Sessions:
+                        Session.Need_Key_Frame = True
+                    continue
+            if not Cached:
+                for Session in Group_Sessions:
+                    if Session.Input_Tag is not None:
+                        self._Send_Input_Ack(Session)
+            try:
+                self._Socket.Broadcast([Session.Client for Session in Group_Sessions], Frame_Bytes, Replace_Key="Frame")
+            except Exception:
+                pass
+            for Session in Group_Sessions:
+                self._Record_First_Frame(Session, Cached)
+
+    def _Record_First_Frame(self, Session, Cached):
+        Started = Session.First_Frame_Start
+        if Started is None:
+            return
+        Session.First_Frame_Start = None
+        Elapsed = time.monotonic() - Started
+        Session.First_Frame = Elapsed
+        First_Frame = self._First_Frame
+        First_Frame["Count"] += 1
+        First_Frame["Total"] += Elapsed
+        First_Frame["Max"] = max(First_Frame["Max"], Elapsed)
+        First_Frame["Last"] = Elapsed
+        if Cached:
+            First_Frame["Cached"] += 1
+
+    def _Stamp_Input(self, Session, Message):
+        Seq = Message.get("Seq")
+        Client_Time = Message.get("Time")
+        if Session is None or not isinstance(Seq, int) or not isinstance(Client_Time, int):
+            return
+        Session.Input_Stamp = (Seq, Client_Time, time.monotonic())
+
+    def _Tag_Input(self, Monitor_Index, Grab_Time):
+        for Session in self._Sessions.Controllers():
+            Stamp = Session.Input_Stamp
+            if Stamp is None or Session.Monitor_Index != Monitor_Index or Stamp[2] > Grab_Time:
+                continue
+            Session.Input_Stamp = None
+            if Grab_Time - Stamp[2] <= self.Input_Tag_Timeout:
+                Session.Input_Tag = Stamp
+
+    def _Send_Input_Ack(self, Session, Changed=True):
+        Tag = Session.Input_Tag
+        Session.Input_Tag = None
+        Elapsed = time.monotonic() - Tag[2]
+        if Elapsed > self.Input_Tag_Timeout:
+            return
+        if Changed:
+            self._Input_Server_Latency.append(Elapsed)
+        else:
+            self._Input_Unchanged_Server_Latency.append(Elapsed)
+        try:
+            self._Socket.Send(Session.Client, json.dumps({"Type": "Input_Ack", "Seq": Tag[0], "Time": Tag[1], "Changed": Changed}, separators=(",", ":")))
+        except Exception:
+            pass
+
+    def _Ack_Unchanged_Input(self):
+        for Session in self._Sessions.Controllers():
+            if Session.Input_Tag is not None:
+                self._Send_Input_Ack(Session, False)
+
+    def _Handle_Input_Latency(self, Message, Client):
+        Session = self._Sessions.Get(Client)
+        if not Session or not Session.Authenticated:
+            return
+        Samples = self._Latency_Samples(Message.get("Samples"))
+        Unchanged = self._Latency_Samples(Message.get("Unchanged"))
+        if not Samples and not Unchanged:
+            return
+        if Samples:
+            if Session.Input_Latency is None:
+                Session.Input_Latency = collections.deque(maxlen=200)
+            Session.Input_Latency.extend(Samples)
+            self._Input_Latency.extend(Samples)
+        self._Input_Unchanged_Latency.extend(Unchanged)
+        Event_Data = {"Event": "Input_Latency", "User": Session.User, "User_Key": Session.User_Key or ""}
+        Event_Data.update(self._Latency_Stats(Samples))
+        Event_Data["Unchanged"] = self._Latency_Stats(Unchanged)
+        self._Emit_Event(Event_Data)
+
+    def _Latency_Samples(self, Values):
+        if not isinstance(Values, list):
+            return []
+        Samples = []
+        for Sample in Values[:200]:
+            if isinstance(Sample, (int, float)) and 0 <= Sample < 60000:
+                Samples.append(Sample / 1000.0)
+        return Samples
+
+    def _Latency_Stats(self, Samples):
+        Ordered = sorted(Samples)
+        Count = len(Ordered)
+        if not Count:
+            return {"Count": 0, "P50": None, "P95": None, "P99": None, "Max": None}
+        return {"Count": Count, "P50": Ordered[Count // 2], "P95": Ordered[min(Count - 1, Count * 95 // 100)], "P99": Ordered[min(Count - 1, Count * 99 // 100)], "Max": Ordered[-1]}
+
+    def _Update_Links(self, Viewers):
+        Now = time.monotonic()
+        for Session in Viewers:
+            Link = Session.Link
+            if Link is None:
+                Link = Link_Control()
+                Session.Link = Link
+            if Now - Link.Last_Update < Link.Update_Interval:
+                continue
+            try:
+                Link_Stats = self._Socket.Client_Stats(Session.Client)
+            except Exception:
+                Link_Stats = None
+            if Link_Stats is None:
+                continue
+            if Link.Update(Now, Link_Stats):
+                Session.Need_Key_Frame = True
+                self._Emit_Event({"Event": "Link_Change", "User": Session.User, "User_Key": Session.User_Key or "", "Level": Link.Level, "Rtt": Link.Rtt, "Throughput": Link.Throughput})
+            try:
+                self._Socket.Ping(Session.Client)
+            except Exception:
+                pass
+
+    def _Find_Dirty_Rects(self, Previous_Raw, Raw, Width, Height):
+        if len(Previous_Raw) != len(Raw):
+            return None
+        Tile_Size = self._Tile_Size
+        if Tile_Size <= 0:
+            return [(0, 0, Width, Height)]
+        Stride = Width * 4
+        Previous_View = memoryview(Previous_Raw)
+        Rects = []
+        Dirty_Area = 0
+        for Band_Y in range(0, Height, Tile_Size):
+            Band_Height = min(Tile_Size, Height - Band_Y)
+            Band_Start = Band_Y * Stride
+            Band_End = Band_Start + Band_Height * Stride
+            if Raw.startswith(Previous_View[Band_Start:Band_End], Band_Start):
+                continue
+            Run_X = None
+            for Tile_X in range(0, Width, Tile_Size):
+                Tile_Width = min(Tile_Size, Width - Tile_X)
+                Tile_Dirty = False
+                Row_Start = Band_Start + Tile_X * 4
+                Row_Length = Tile_Width * 4
+                for Row_Index in range(Band_Height):
+                    if not Raw.startswith(Previous_View[Row_Start:Row_Start + Row_Length], Row_Start):
+                        Tile_Dirty = True
+                        break
+                    Row_Start += Stride
+                if Tile_Dirty:
+                    if Run_X is None:
+                        Run_X = Tile_X
+                elif Run_X is not None:
+                    Rects.append((Run_X, Band_Y, Tile_X - Run_X, Band_Height))
+                    Dirty_Area += (Tile_X - Run_X) * Band_Height
+                    Run_X = None
+            if Run_X is not None:
+                Rects.append((Run_X, Band_Y, Width - Run_X, Band_Height))
+                Dirty_Area += (Width - Run_X) * Band_Height
+        if Dirty_Area * 2 >= Width * Height:
+            return [(0, 0, Width, Height)]
+        return Rects
+
+    def _Scale_Rects(self, Rects, Width, Height, Scale_Size):
+        Scaled_Width, Scaled_Height = Scale_Size
+        if Scaled_Width == Width and Scaled_Height == Height:
+            return Rects
+        Scaled_Rects = []
+        for X, Y, Rect_Width, Rect_Height in Rects:
+            Left = max(0, X * Scaled_Width // Width - 2)
+            Top = max(0, Y * Scaled_Height // Height - 2)
+            Right = min(Scaled_Width, math.ceil((X + Rect_Width) * Scaled_Width / Width) + 2)
+            Bottom = min(Scaled_Height, math.ceil((Y + Rect_Height) * Scaled_Height / Height) + 2)
+            Scaled_Rects.append((Left, Top, Right - Left, Bottom - Top))
+        return Scaled_Rects
+
+    def _Merge_Rects(self, First_Rects, Second_Rects, Width, Height):
+        if First_Rects is None or Second_Rects is None:
+            return None
+        Tile_Size = self._Tile_Size
+        if Tile_Size <= 0:
+            return [(0, 0, Width, Height)] if First_Rects or Second_Rects else []
+        Bands = {}
+        for X, Y, Rect_Width, Rect_Height in list(First_Rects) + list(Second_Rects):
+            if Rect_Width <= 0 or Rect_Height <= 0:
+                continue
+            for Band_Index in range(Y // Tile_Size, (Y + Rect_Height - 1) // Tile_Size + 1):
+                Bands.setdefault(Band_Index, set()).update(range(X // Tile_Size, (X + Rect_Width - 1) // Tile_Size + 1))
+        Rects = []
+        Dirty_Area = 0
+        for Band_Index in sorted(Bands):
+            Band_Y = Band_Index * Tile_Size
+            Band_Height = min(Tile_Size, Height - Band_Y)
+            Run_X = None
+            Columns = sorted(Bands[Band_Index])
+            for Position, Column in enumerate(Columns):
+                if Run_X is None:
+                    Run_X = Column * Tile_Size
+                if Position + 1 == len(Columns) or Columns[Position + 1] != Column + 1:
+                    Run_Width = min(Width, (Column + 1) * Tile_Size) - Run_X
+                    Rects.append((Run_X, Band_Y, Run_Width, Band_Height))
+                    Dirty_Area += Run_Width * Band_Height
+                    Run_X = None
+        if Dirty_Area * 2 >= Width * Height:
+            return [(0, 0, Width, Height)]
+        return Rects
+
+    def _Client_Encoder(self, Session):
+        Format_Name = Session.Format or self._Frame_Format
+        Quality = Session.Quality or self._Frame_Quality
+        Link = Session.Link
+        if Link is not None:
+            Quality = Link.Quality(Quality)
+        Encoder_Key = (Format_Name, Quality)
+        Frame_Encoder = self._Encoders.get(Encoder_Key)
+        if Frame_Encoder is None:
+            Frame_Encoder = Encoder.Create(Format_Name, Quality=Quality, Level=self._Png_Level, Strategy=self._Png_Strategy)
+            self._Encoders[Encoder_Key] = Frame_Encoder
+        return Frame_Encoder
+
+    def _Build_Frame_Message(self, Frame_Encoder, Raw, Width, Height, Rects, Staged=None):
+        if Staged is not None:
+            return self._Encode_Pool.Submit(Frame_Encoder, Staged, Width, Height, Rects)
+        Parts = [struct.pack("!BBHHH", 1, Frame_Encoder.Format, Width, Height, len(Rects))]
+        for X, Y, Rect_Width, Rect_Height in Rects:
+            Data = Frame_Encoder.Encode(Raw, Width, Height, X, Y, Rect_Width, Rect_Height)
+            Parts.append(struct.pack("!HHHHI", X, Y, Rect_Width, Rect_Height, sum(len(Part) for Part in Data)))
+            Parts.extend(Data)
+        return tuple(Parts)
+
+    def _Mouse_Loop(self):
+        Down = False
+        Prev_Abs = None
+        while self._Running:
+            with self._Mouse_Condition:
+                while self._Running and not self._Mouse_Moved and not self._Mouse_Buttons:
+                    self._Mouse_Condition.wait()
+                Buttons = list(self._Mouse_Buttons)
+                self._Mouse_Buttons.clear()
+                Moved = self._Mouse_Moved
+                self._Mouse_Moved = False
                 X_Val = self._Mouse_X
                 Y_Val = self._Mouse_Y
-                Prev_Down = self._Mouse_Prev_Down
-                Prev_X = self._Mouse_Prev_X
-                Prev_Y = self._Mouse_Prev_Y
-            if self._Screen_Size is not None and Has_State:
-                Screen_Width, Screen_Height = self._Screen_Size
+                Stamp = self._Mouse_Stamp
+                self._Mouse_Stamp = None
+            if self._Screen_Size is None:
                 try:
-                    X_Clamped = max(0.0, min(1.0, float(X_Val)))
-                    Y_Clamped = max(0.0, min(1.0, float(Y_Val)))
+                    self._Screen_Size = self._Input.Size()
                 except Exception:
-                    X_Clamped = 0.0
-                    Y_Clamped = 0.0
+                    self._Screen_Size = None
+            if self._Screen_Size is None:
+                continue
+            Screen_Width, Screen_Height = self._Screen_Size
+            if Moved:
+                Buttons.append((None, None, X_Val, Y_Val))
+            for Button_Down, Button, X_Clamped, Y_Clamped in Buttons:
                 X_Abs = int(X_Clamped * Screen_Width)
                 Y_Abs = int(Y_Clamped * Screen_Height)
-                Move_Needed = True
-                if Prev_X is not None and Prev_Y is not None:
-                    Prev_X_Abs = int(Prev_X * Screen_Width)
-                    Prev_Y_Abs = int(Prev_Y * Screen_Height)
-                    if Prev_X_Abs == X_Abs and Prev_Y_Abs == Y_Abs:
-                        Move_Needed = False
                 try:
-                    if Move_Needed:
-                        pyautogui.moveTo(X_Abs, Y_Abs)
-                    if Down and not Prev_Down:
-                        pyautogui.mouseDown(x=X_Abs, y=Y_Abs, button=Button)
-                    elif not Down and Prev_Down:
-                        pyautogui.mouseUp(x=X_Abs, y=Y_Abs, button=Button)
+                    if (X_Abs, Y_Abs) != Prev_Abs:
+                        self._Input.Move(X_Abs, Y_Abs)
+                        Prev_Abs = (X_Abs, Y_Abs)
+                    if Button_Down is True and not Down:
+                        self._Input.Button(Button, True, X_Abs, Y_Abs)
+                    elif Button_Down is False and Down:
+                        self._Input.Button(Button, False, X_Abs, Y_Abs)
                 except Exception:
                     pass
-                with self._Mouse_Lock:
-                    self._Mouse_Prev_Down = Down
-                    self._Mouse_Prev_X = X_Clamped
-                    self._Mouse_Prev_Y = Y_Clamped
-            time.sleep(0.002)
+                if Button_Down is not None:
+                    Down = Button_Down
+            if Stamp is not None:
+                self._Stamp_Input(*Stamp)
+
+    def _Handle_Hello(self, Message, Client):
+        Session = self._Sessions.Get(Client)
+        if Session:
+            Format_Value = Message.get("Format")
+            if isinstance(Format_Value, str) and Format_Value.strip().lower() in Encoder.Formats:
+                Format_Name = Format_Value.strip().lower()
+                if Format_Name != "png" and Image is None:
+                    Format_Name = "png"
+                if Format_Name != Session.Format:
+                    Session.Format = Format_Name
+                    Session.Need_Key_Frame = True
+            Quality_Value = Message.get("Quality")
+            try:
+                Quality_Int = max(1, min(100, int(Quality_Value)))
+            except Exception:
+                Quality_Int = None
+            if Quality_Int is not None and Quality_Int != Session.Quality:
+                Session.Quality = Quality_Int
+                Session.Need_Key_Frame = True
+            if "Viewport" in Message:
+                self._Handle_Viewport(Message.get("Viewport") or {}, Client)
+        self._Send_Monitor_Info(Client)
+
+    def _Handle_Viewport(self, Message, Client):
+        Session = self._Sessions.Get(Client)
+        if not Session:
+            return
+        try:
+            Ratio = float(Message.get("Ratio") or 1.0)
+            Viewport_Width = float(Message.get("Width")) * max(0.5, min(4.0, Ratio))
+            Viewport_Height = float(Message.get("Height")) * max(0.5, min(4.0, Ratio))
+        except Exception:
+            return
+        if Viewport_Width < 1 or Viewport_Height < 1:
+            return
+        Mode = Message.get("Mode")
+        if Mode not in ("fit", "actual", "stretch"):
+            Mode = "fit"
+        Session.Viewport = (Viewport_Width, Viewport_Height, Mode)
 
     def _Send_Monitor_Info(self, Client):
         with self._Monitor_Lock:
             Count = self._Monitor_Count
-        Info = self._Clients_Info.get(Client)
-        if Info and "Monitor_Index" in Info:
-            Active = Info.get("Monitor_Index") or 1
+        Session = self._Sessions.Get(Client)
+        if Session:
+            Active = Session.Monitor_Index or 1
         else:
             Active = 1
         if Active < 1:
@@ -442,6 +1033,10 @@ class VNC:
             pass
 
     def _Handle_Monitor_Select(self, Message, Client):
+        if self._Upstream_Url:
+            if self._Client_Has_Control(Client):
+                self._Relay_Forward(Message)
+            return
         Index_Value = Message.get("Index")
         try:
             Index_Int = int(Index_Value)
@@ -457,30 +1052,31 @@ class VNC:
             if Index_Int > Count:
                 Index_Int = Count
             Count_Out = self._Monitor_Count
-        Info = self._Clients_Info.get(Client) or {}
-        Info["Monitor_Index"] = Index_Int
-        self._Clients_Info[Client] = Info
+        Session = self._Sessions.Open(Client)
+        Session.First_Frame_Start = time.monotonic()
+        self._Sessions.Subscribe(Session, Index_Int)
         Active = Index_Int
         Payload = json.dumps({"Type": "Monitors", "Count": Count_Out, "Active": Active}, separators=(",", ":"))
         try:
             self._Socket.Send(Client, Payload)
         except Exception:
             pass
+        self._Pacer.Wake()
 
     def _Client_Has_Control(self, Client):
-        Info = self._Clients_Info.get(Client)
-        if not Info:
+        Session = self._Sessions.Get(Client)
+        if not Session:
             return False
-        if not Info.get("Authenticated"):
+        if not Session.Authenticated:
             return False
-        if not Info.get("Control_Allowed"):
+        if not Session.Control_Allowed:
             return False
-        if not Info.get("Has_Control"):
+        if not Session.Has_Control:
             return False
-        User_Key = Info.get("User_Key")
+        User_Key = Session.User_Key
         if not User_Key:
             return False
-        if User_Key != self._Controller_User_Key:
+        if User_Key != self._Sessions.Controller_Key:
             return False
         return True
 
@@ -492,10 +1088,13 @@ class VNC:
             Payload["Controller"] = str(Controller_Name)
         if Success:
             Payload["Control"] = bool(Control_Allowed)
-            Info = self._Clients_Info.get(Client)
-            if Info:
-                Payload["User"] = Info.get("User") or ""
-                Payload["Active"] = bool(Info.get("Has_Control"))
+            Session = self._Sessions.Get(Client)
+            if Session:
+                Payload["User"] = Session.User
+                Payload["Active"] = Session.Has_Control
+                if Session.Resume_Token:
+                    Payload["Resume"] = Session.Resume_Token
+                    Payload["Resume_Ttl"] = self._Resume_Ttl
             else:
                 Payload["User"] = ""
                 Payload["Active"] = False
@@ -506,18 +1105,17 @@ class VNC:
             pass
 
     def _Handle_Control_Release(self, Message, Client):
-        Info = self._Clients_Info.get(Client)
-        if not Info or not Info.get("Authenticated") or not Info.get("Control_Allowed"):
+        Session = self._Sessions.Get(Client)
+        if not Session or not Session.Authenticated or not Session.Control_Allowed:
             return
-        User_Key = Info.get("User_Key")
+        User_Key = Session.User_Key
         if not User_Key:
             return
-        if self._Controller_User_Key != User_Key:
+        if self._Sessions.Controller_Key != User_Key:
             return
-        for Client_Id, Client_Info in list(self._Clients_Info.items()):
-            if Client_Info.get("User_Key") == User_Key and Client_Info.get("Authenticated") and Client_Info.get("Control_Allowed"):
-                Client_Info["Has_Control"] = False
-                self._Clients_Info[Client_Id] = Client_Info
+        for User_Session in self._Sessions.By_User(User_Key):
+            if User_Session.Control_Allowed:
+                User_Session.Has_Control = False
                 Payload = {
                     "Type": "Control_Changed",
                     "Active": False,
@@ -525,19 +1123,20 @@ class VNC:
                 }
                 Payload_Text = json.dumps(Payload, separators=(",", ":"))
                 try:
-                    self._Socket.Send(Client_Id, Payload_Text)
+                    self._Socket.Send(User_Session.Client, Payload_Text)
                 except Exception:
                     pass
-        self._Controller_User_Key = None
-        self._Controller_User = None
-        User_Name = Info.get("User") or ""
+        self._Sessions.Set_Controller(None, None)
+        User_Name = Session.User
         self._Emit_Event({"Event": "Control_Change", "Type": "Release", "User": User_Name, "User_Key": User_Key, "Forced": False})
 
     def _Handle_Control_Request(self, Message, Client):
-        Info = self._Clients_Info.get(Client)
-        if not Info or not Info.get("Authenticated"):
+        Session = self._Sessions.Get(Client)
+        if not Session or not Session.Authenticated:
             return
-        Control_Allowed = bool(Info.get("Control_Allowed"))
+        Control_Allowed = Session.Control_Allowed
+        if self._Upstream_Url and not self._Relay_State["Control_Allowed"]:
+            Control_Allowed = False
         if not Control_Allowed:
             Payload = {
                 "Type": "Control_Result",
@@ -551,42 +1150,35 @@ class VNC:
             except Exception:
                 pass
             return
-        User_Key = Info.get("User_Key")
-        User_Name = Info.get("User") or ""
+        User_Key = Session.User_Key
+        User_Name = Session.User
         if not User_Key:
             return
-        if self._Controller_User_Key is not None:
-            Controller_Alive = False
-            for Other_Info in self._Clients_Info.values():
-                if Other_Info.get("User_Key") == self._Controller_User_Key and Other_Info.get("Authenticated") and Other_Info.get("Control_Allowed"):
-                    Controller_Alive = True
-                    break
+        if self._Sessions.Controller_Key is not None:
+            Controller_Alive = any(User_Session.Control_Allowed for User_Session in self._Sessions.By_User(self._Sessions.Controller_Key))
             if not Controller_Alive:
-                self._Controller_User_Key = None
-                self._Controller_User = None
+                self._Sessions.Set_Controller(None, None)
         Force_Flag = bool(Message.get("Force"))
-        if self._Controller_User_Key is None:
-            self._Controller_User_Key = User_Key
-            self._Controller_User = User_Name
-            for Client_Id, Client_Info in list(self._Clients_Info.items()):
-                if Client_Info.get("User_Key") == User_Key and Client_Info.get("Authenticated") and Client_Info.get("Control_Allowed"):
-                    Client_Info["Has_Control"] = True
-                    self._Clients_Info[Client_Id] = Client_Info
+        if self._Sessions.Controller_Key is None:
+            self._Sessions.Set_Controller(User_Key, User_Name)
+            for User_Session in self._Sessions.By_User(User_Key):
+                if User_Session.Control_Allowed:
+                    User_Session.Has_Control = True
                     Change_Payload = {
                         "Type": "Control_Changed",
                         "Active": True,
-                        "Controller": self._Controller_User or ""
+                        "Controller": self._Sessions.Controller_Name or ""
                     }
                     Change_Text = json.dumps(Change_Payload, separators=(",", ":"))
                     try:
-                        self._Socket.Send(Client_Id, Change_Text)
+                        self._Socket.Send(User_Session.Client, Change_Text)
                     except Exception:
                         pass
             Result_Payload = {
                 "Type": "Control_Result",
                 "Success": True,
                 "Active": True,
-                "Controller": self._Controller_User or ""
+                "Controller": self._Sessions.Controller_Name or ""
             }
             Result_Text = json.dumps(Result_Payload, separators=(",", ":"))
             try:
@@ -595,25 +1187,24 @@ class VNC:
                 pass
             self._Emit_Event({"Event": "Control_Change", "Type": "Acquire", "User": User_Name, "User_Key": User_Key, "Forced": Force_Flag, "Previous_Controller_User": "", "Previous_Controller_Key": ""})
             return
-        if self._Controller_User_Key == User_Key:
-            for Client_Id, Client_Info in list(self._Clients_Info.items()):
-                if Client_Info.get("User_Key") == User_Key and Client_Info.get("Authenticated") and Client_Info.get("Control_Allowed"):
-                    Client_Info["Has_Control"] = True
-                    self._Clients_Info[Client_Id] = Client_Info
+        if self._Sessions.Controller_Key == User_Key:
+            for User_Session in self._Sessions.By_User(User_Key):
+                if User_Session.Control_Allowed:
+                    User_Session.Has_Control = True
             Result_Payload = {
                 "Type": "Control_Result",
                 "Success": True,
                 "Active": True,
-                "Controller": self._Controller_User or ""
+                "Controller": self._Sessions.Controller_Name or ""
             }
             Result_Text = json.dumps(Result_Payload, separators=(",", ":"))
             try:
                 self._Socket.Send(Client, Result_Text)
             except Exception:
                 pass
-            self._Emit_Event({"Event": "Control_Change", "Type": "Acquire", "User": User_Name, "User_Key": User_Key, "Forced": Force_Flag, "Previous_Controller_User": self._Controller_User or "", "Previous_Controller_Key": self._Controller_User_Key or ""})
+            self._Emit_Event({"Event": "Control_Change", "Type": "Acquire", "User": User_Name, "User_Key": User_Key, "Forced": Force_Flag, "Previous_Controller_User": self._Sessions.Controller_Name or "", "Previous_Controller_Key": self._Sessions.Controller_Key or ""})
             return
-        Current_Controller_Name = self._Controller_User or ""
+        Current_Controller_Name = self._Sessions.Controller_Name or ""
         if not Force_Flag:
             Result_Payload = {
                 "Type": "Control_Result",
@@ -628,12 +1219,11 @@ class VNC:
             except Exception:
                 pass
             return
-        Old_Key = self._Controller_User_Key
-        Old_Name = self._Controller_User or ""
-        for Client_Id, Client_Info in list(self._Clients_Info.items()):
-            if Client_Info.get("User_Key") == Old_Key and Client_Info.get("Authenticated") and Client_Info.get("Control_Allowed"):
-                Client_Info["Has_Control"] = False
-                self._Clients_Info[Client_Id] = Client_Info
+        Old_Key = self._Sessions.Controller_Key
+        Old_Name = self._Sessions.Controller_Name or ""
+        for User_Session in self._Sessions.By_User(Old_Key):
+            if User_Session.Control_Allowed:
+                User_Session.Has_Control = False
                 Lose_Payload = {
                     "Type": "Control_Changed",
                     "Active": False,
@@ -641,30 +1231,28 @@ class VNC:
                 }
                 Lose_Text = json.dumps(Lose_Payload, separators=(",", ":"))
                 try:
-                    self._Socket.Send(Client_Id, Lose_Text)
+                    self._Socket.Send(User_Session.Client, Lose_Text)
                 except Exception:
                     pass
-        self._Controller_User_Key = User_Key
-        self._Controller_User = User_Name
-        for Client_Id, Client_Info in list(self._Clients_Info.items()):
-            if Client_Info.get("User_Key") == User_Key and Client_Info.get("Authenticated") and Client_Info.get("Control_Allowed"):
-                Client_Info["Has_Control"] = True
-                self._Clients_Info[Client_Id] = Client_Info
+        self._Sessions.Set_Controller(User_Key, User_Name)
+        for User_Session in self._Sessions.By_User(User_Key):
+            if User_Session.Control_Allowed:
+                User_Session.Has_Control = True
                 Gain_Payload = {
                     "Type": "Control_Changed",
                     "Active": True,
-                    "Controller": self._Controller_User or ""
+                    "Controller": self._Sessions.Controller_Name or ""
                 }
                 Gain_Text = json.dumps(Gain_Payload, separators=(",", ":"))
                 try:
-                    self._Socket.Send(Client_Id, Gain_Text)
+                    self._Socket.Send(User_Session.Client, Gain_Text)
                 except Exception:
                     pass
         Result_Payload = {
             "Type": "Control_Result",
             "Success": True,
             "Active": True,
-            "Controller": self._Controller_User or ""
+            "Controller": self._Sessions.Controller_Name or ""
         }
         Result_Text = json.dumps(Result_Payload, separators=(",", ":"))
         try:
@@ -694,38 +1282,270 @@ class VNC:
             self._Send_Login_Result(Client, False, "Invalid username or password", None, False)
             return
         Control_Allowed = bool(User_Info.get("Control"))
-        Info = self._Clients_Info.get(Client) or {}
-        Info["User"] = User_Name_Text
-        Info["User_Key"] = User_Key
-        Info["Authenticated"] = True
-        Info["Control_Allowed"] = Control_Allowed
-        Info["Has_Control"] = False
-        if "Monitor_Index" not in Info:
-            Info["Monitor_Index"] = 1
-        self._Clients_Info[Client] = Info
-        Controller_Name = self._Controller_User
+        Session = self._Sessions.Open(Client)
+        Session.First_Frame_Start = time.monotonic()
+        self._Sessions.Login(Session, User_Name_Text, User_Key, Control_Allowed)
+        self._Issue_Resume_Token(Session)
+        Controller_Name = self._Sessions.Controller_Name
         self._Send_Login_Result(Client, True, None, Controller_Name, Control_Allowed)
         self._Send_Monitor_Info(Client)
+        self._Pacer.Wake()
         self._Emit_Event({"Event": "Login", "User": User_Name_Text, "User_Key": User_Key, "Control_Allowed": Control_Allowed})
 
+    def _Handle_Resume(self, Message, Client):
+        Token = Message.get("Token")
+        Entry = None
+        if isinstance(Token, str):
+            with self._Resume_Lock:
+                self._Purge_Resume_Tokens()
+                Entry = self._Resume_Tokens.get(Token)
+                if Entry is not None and Entry["Expires"] is not None:
+                    del self._Resume_Tokens[Token]
+                else:
+                    Entry = None
+        User_Info = self._Users.get(Entry["User_Key"]) if Entry else None
+        if not User_Info:
+            self._Send_Login_Result(Client, False, "Session expired", None, False)
+            return
+        User_Key = Entry["User_Key"]
+        User_Name_Text = Entry["User"]
+        Control_Allowed = bool(User_Info.get("Control"))
+        Session = self._Sessions.Open(Client)
+        Session.First_Frame_Start = time.monotonic()
+        for Name in ("Format", "Quality", "Viewport"):
+            if Entry.get(Name) is not None:
+                setattr(Session, Name, Entry[Name])
+        with self._Monitor_Lock:
+            Count = max(1, self._Monitor_Count)
+        self._Sessions.Subscribe(Session, max(1, min(Count, int(Entry.get("Monitor_Index") or 1))))
+        self._Sessions.Login(Session, User_Name_Text, User_Key, Control_Allowed)
+        self._Issue_Resume_Token(Session)
+        if Entry.get("Has_Control") and Control_Allowed and self._Sessions.Controller_Key in (None, User_Key):
+            self._Sessions.Set_Controller(User_Key, User_Name_Text)
+            Session.Has_Control = True
+            self._Emit_Event({"Event": "Control_Change", "Type": "Resume", "User": User_Name_Text, "User_Key": User_Key})
+        self._Send_Login_Result(Client, True, None, self._Sessions.Controller_Name, Control_Allowed)
+        self._Send_Monitor_Info(Client)
+        self._Pacer.Wake()
+        self._Emit_Event({"Event": "Resume", "User": User_Name_Text, "User_Key": User_Key, "Control_Allowed": Control_Allowed})
+
+    def _Issue_Resume_Token(self, Session):
+        with self._Resume_Lock:
+            Old_Token = Session.Resume_Token
+            Session.Resume_Token = None
+            if Old_Token is not None:
+                self._Resume_Tokens.pop(Old_Token, None)
+            if self._Resume_Ttl <= 0:
+                return None
+            self._Purge_Resume_Tokens()
+            Token = secrets.token_urlsafe(24)
+            self._Resume_Tokens[Token] = {"User": Session.User, "User_Key": Session.User_Key, "Expires": None}
+            Session.Resume_Token = Token
+        return Token
+
+    def _Park_Session(self, Session):
+        Token = Session.Resume_Token
+        if Token is None:
+            return
+        with self._Resume_Lock:
+            Entry = self._Resume_Tokens.get(Token)
+            if Entry is None:
+                return
+            Entry["Expires"] = time.monotonic() + self._Resume_Ttl
+            Entry["Monitor_Index"] = Session.Monitor_Index
+            Entry["Format"] = Session.Format
+            Entry["Quality"] = Session.Quality
+            Entry["Viewport"] = Session.Viewport
+            Entry["Has_Control"] = Session.Has_Control
+
+    def _Purge_Resume_Tokens(self):
+        Now = time.monotonic()
+        for Token, Entry in list(self._Resume_Tokens.items()):
+            if Entry["Expires"] is not None and Entry["Expires"] < Now:
+                del self._Resume_Tokens[Token]
+
+    def _Revoke_Resume_Tokens(self, User_Key):
+        with self._Resume_Lock:
+            for Token, Entry in list(self._Resume_Tokens.items()):
+                if Entry["User_Key"] == User_Key:
+                    del self._Resume_Tokens[Token]
+
     def _Handle_Logout(self, Client):
-        Info = self._Clients_Info.get(Client)
-        if not Info:
+        Session = self._Sessions.Get(Client)
+        if not Session:
             return
-        User_Key = Info.get("User_Key")
-        User_Name = Info.get("User") or ""
-        if Info.get("Has_Control"):
-            if User_Key and User_Key == self._Controller_User_Key:
-                self._Controller_User_Key = None
-                self._Controller_User = None
+        User_Key = Session.User_Key
+        User_Name = Session.User
+        if Session.Has_Control:
+            if User_Key and User_Key == self._Sessions.Controller_Key:
+                self._Sessions.Set_Controller(None, None)
                 self._Emit_Event({"Event": "Control_Change", "Type": "Logout", "User": User_Name, "User_Key": User_Key})
-        Info["Authenticated"] = False
-        Info["Control_Allowed"] = False
-        Info["Has_Control"] = False
-        self._Clients_Info[Client] = Info
+        self._Sessions.Logout(Session)
+        with self._Resume_Lock:
+            self._Resume_Tokens.pop(Session.Resume_Token, None)
+            Session.Resume_Token = None
         if User_Key:
             self._Emit_Event({"Event": "Logout", "User": User_Name, "User_Key": User_Key})
 
+    def _Handle_Refresh(self, Message, Client):
+        Session = self._Sessions.Get(Client)
+        if not Session or not Session.Authenticated:
+            return
+        Session.Need_Key_Frame = True
+        self._Pacer.Wake()
+
+    def _Relay_Loop(self):
+        Delay = 1.0
+        while self._Running:
+            Upstream = HTTP.Client(self._Upstream_Url)
+            try:
+                Upstream.Connect()
+                Upstream.Send(json.dumps({"Type": "Login", "User": self._Upstream_User, "Password": hashlib.md5(self._Upstream_Password.encode("utf-8")).hexdigest()}, separators=(",", ":")))
+                self._Upstream = Upstream
+                while self._Running:
+                    Payload = Upstream.Receive(0.1)
+                    if isinstance(Payload, bytes):
+                        self._Relay_Frame(Payload)
+                    elif Payload is not None:
+                        if self._Relay_Text(json.loads(Payload)):
+                            Delay = 1.0
+                    self._Relay_Sync(Upstream)
+            except Exception:
+                pass
+            self._Upstream = None
+            Upstream.Close()
+            if self._Relay_State["Connected"]:
+                self._Relay_State["Connected"] = False
+                self._Emit_Event({"Event": "Relay", "Type": "Disconnect", "Upstream": self._Upstream_Url})
+            self._Relay_State["Control"] = False
+            self._Relay_State["Control_Requested"] = 0.0
+            self._Relay_State["Refresh_Requested"] = 0.0
+            self._Relay_Release_Local("")
+            for Session in self._Sessions.Viewers():
+                Session.Need_Key_Frame = True
+            End = time.monotonic() + max(Delay, self._Relay_State["Retry_After"])
+            self._Relay_State["Retry_After"] = 0.0
+            while self._Running and time.monotonic() < End:
+                time.sleep(0.05)
+            Delay = min(30.0, Delay * 2)
+            self._Relay_State["Reconnects"] += 1
+
+    def _Relay_Frame(self, Payload):
+        self._Relay_State["Frames"] += 1
+        self._Relay_State["Bytes"] += len(Payload)
+        Key_Frame = False
+        if len(Payload) >= 20:
+            Frame_Width, Frame_Height, Rect_Count = struct.unpack_from("!HHH", Payload, 2)
+            Key_Frame = Rect_Count == 1 and struct.unpack_from("!HHHH", Payload, 8) == (0, 0, Frame_Width, Frame_Height)
+        if Key_Frame:
+            self._Relay_State["Refresh_Requested"] = 0.0
+        Viewers = []
+        for Session in self._Sessions.Viewers():
+            if not Key_Frame:
+                if Session.Need_Key_Frame:
+                    continue
+                if self._Socket.Pending(Session.Client, "Frame"):
+                    Session.Need_Key_Frame = True
+                    continue
+            Session.Need_Key_Frame = False
+            Viewers.append(Session)
+        if Viewers:
+            try:
+                self._Socket.Broadcast([Session.Client for Session in Viewers], Payload, Replace_Key="Frame")
+            except Exception:
+                pass
+        for Session in Viewers:
+            self._Record_First_Frame(Session, False)
+
+    def _Relay_Text(self, Message):
+        Message_Type = Message.get("Type")
+        if Message_Type == "Busy":
+            try:
+                self._Relay_State["Retry_After"] = max(0.0, float(Message.get("Retry_After") or 0))
+            except Exception:
+                pass
+            raise ConnectionError("upstream busy")
+        if Message_Type == "Login_Result":
+            if not Message.get("Success"):
+                self._Emit_Event({"Event": "Relay", "Type": "Login_Failed", "Upstream": self._Upstream_Url, "Error": Message.get("Error") or ""})
+                raise ConnectionError("upstream login failed")
+            self._Relay_State["Connected"] = True
+            self._Relay_State["Control_Allowed"] = bool(Message.get("Control"))
+            self._Emit_Event({"Event": "Relay", "Type": "Connect", "Upstream": self._Upstream_Url, "Control_Allowed": self._Relay_State["Control_Allowed"]})
+            return True
+        if Message_Type == "Monitors":
+            try:
+                Count = max(1, int(Message.get("Count") or 1))
+                Active = max(1, min(Count, int(Message.get("Active") or 1)))
+            except Exception:
+                return False
+            with self._Monitor_Lock:
+                self._Monitor_Count = Count
+                self._Active_Monitor_Index = Active
+            for Session in self._Sessions.Viewers():
+                if Session.Monitor_Index != Active:
+                    self._Sessions.Subscribe(Session, Active)
+                self._Send_Monitor_Info(Session.Client)
+        elif Message_Type == "Control_Result":
+            self._Relay_State["Control"] = bool(Message.get("Success") and Message.get("Active"))
+            self._Relay_State["Control_Requested"] = 0.0
+            if not self._Relay_State["Control"]:
+                self._Relay_Release_Local(Message.get("Controller") or "")
+        elif Message_Type == "Input_Ack":
+            Ack_Text = json.dumps(Message, separators=(",", ":"))
+            for Session in self._Sessions.Controllers():
+                try:
+                    self._Socket.Send(Session.Client, Ack_Text)
+                except Exception:
+                    pass
+        elif Message_Type == "Control_Changed":
+            self._Relay_State["Control"] = bool(Message.get("Active"))
+            if not self._Relay_State["Control"]:
+                self._Relay_Release_Local(Message.get("Controller") or "")
+        return False
+
+    def _Relay_Sync(self, Upstream):
+        if not self._Relay_State["Connected"]:
+            return
+        Now = time.monotonic()
+        if Now - self._Relay_State["Refresh_Requested"] > 1.0:
+            Need_Key_Frame = any(Session.Need_Key_Frame for Session in self._Sessions.Viewers())
+            if Need_Key_Frame:
+                self._Relay_State["Refresh_Requested"] = Now
+                Upstream.Send('{"Type":"Refresh"}')
+        Want_Control = self._Sessions.Controller_Key is not None and self._Relay_State["Control_Allowed"]
+        if Want_Control and not self._Relay_State["Control"] and Now - self._Relay_State["Control_Requested"] > 5.0:
+            self._Relay_State["Control_Requested"] = Now
+            Upstream.Send('{"Type":"Control_Request","Force":false}')
+        elif not Want_Control and self._Relay_State["Control"]:
+            self._Relay_State["Control"] = False
+            Upstream.Send('{"Type":"Control_Release"}')
+
+    def _Relay_Forward(self, Message):
+        Upstream = self._Upstream
+        if Upstream is None or not self._Relay_State["Control"]:
+            return
+        try:
+            Upstream.Send(json.dumps(Message, separators=(",", ":")))
+        except Exception:
+            pass
+
+    def _Relay_Release_Local(self, Controller_Name):
+        Controller_User_Key = self._Sessions.Controller_Key
+        if Controller_User_Key is None:
+            return
+        Controllers = self._Sessions.Controllers()
+        if Controllers:
+            self._Handle_Control_Release({}, Controllers[0].Client)
+        if self._Sessions.Controller_Key == Controller_User_Key:
+            self._Sessions.Set_Controller(None, None)
+        if Controller_Name:
+            for Session in self._Sessions.By_User(Controller_User_Key):
+                try:
+                    self._Socket.Send(Session.Client, json.dumps({"Type": "Control_Result", "Success": False, "Active": False, "In_Use": True, "Controller": Controller_Name}, separators=(",", ":")))
+                except Exception:
+                    pass
+
     def _Run_Forever(self):
         try:
             while self._Running:
@@ -1078,7 +1898,6 @@ html, body {
 #Screen_Image {
     max-width: 100%;
     max-height: 100%;
-    image-rendering: pixelated;
     object-fit: contain;
 }
 #Key_Combo_Popup {
@@ -1245,18 +2064,31 @@ html, body {
     </div>
 </div>
 <div id="Screen_Container">
-    <img id="Screen_Image" src="" draggable="false" />
+    <canvas id="Screen_Image" width="1" height="1"></canvas>
 </div>
 <script>
 var Web_Socket = null;
 var Screen_Image = null;
 var Mouse_Is_Down = false;
 var Mouse_Button = "left";
+var Mouse_Pending_Move = null;
+var Mouse_Move_Frame = null;
+var Input_Actions = { move: 0, down: 1, up: 2, click: 3, press: 4 };
+var Input_Buttons = { left: 0, right: 1, middle: 2 };
+var Input_Text_Encoder = (typeof TextEncoder !== "undefined") ? new TextEncoder() : null;
+var Input_Seq = 0;
+var Input_Ack_Pending = null;
+var Input_Latency_Samples = [];
+var Input_Unchanged_Samples = [];
+var Input_Latency_Timer = null;
 var Monitor_Bar = null;
 var Reconnect_Timer = null;
 var Monitor_Count = 1;
 var Monitor_Active = 1;
-var Frame_Object_Url = null;
+var Screen_Context = null;
+var Frame_Draw_Chain = null;
+var Frame_Mime_Types = ["image/png", "image/jpeg", "image/webp"];
+var Viewport_Timer = null;
 var Side_Bar = null;
 var Side_Bar_Header = null;
 var Side_Toggle_Circle = null;
@@ -1299,6 +2131,12 @@ var Control_Confirm_Bar = null;
 var Control_Yes_Button = null;
 var Control_No_Button = null;
 var Force_Control_Pending = false;
+var Resume_Token = null;
+var Resume_Pending = false;
+var Reconnect_Attempts = 0;
+var Reconnect_Retry_After = 0;
+var Reconnect_Base_Delay = 500;
+var Reconnect_Max_Delay = 30000;
 
 var Md5_T_Values = [];
 var Md5_Shift_Amounts = [
@@ -1436,6 +2274,10 @@ function Start_Connection() {
             Reconnect_Timer = null;
         }
         Set_Status_State("green");
+        if (Resume_Token) {
+            Resume_Pending = true;
+            Web_Socket.send(JSON.stringify({ Type: "Resume", Token: Resume_Token }));
+        }
     };
     Web_Socket.onmessage = function(Event) {
         var Data = Event.data;
@@ -1460,6 +2302,14 @@ function Start_Connection() {
             Handle_Control_Result(Msg);
         } else if (Msg.Type === "Control_Changed") {
             Handle_Control_Changed(Msg);
+        } else if (Msg.Type === "Busy") {
+            Reconnect_Retry_After = Number(Msg.Retry_After) || 0;
+        } else if (Msg.Type === "Input_Ack") {
+            if (Msg.Changed === false) {
+                Record_Input_Latency(Msg, true);
+            } else {
+                Input_Ack_Pending = Msg;
+            }
         }
     };
     Web_Socket.onclose = function(Event) {
@@ -1471,21 +2321,64 @@ function Start_Connection() {
 }
 
 function Handle_Frame(Data) {
-    if (!Screen_Image) {
+    if (!Screen_Image || !Screen_Context) {
         return;
     }
-    if (!(Data instanceof ArrayBuffer)) {
+    if (!(Data instanceof ArrayBuffer) || Data.byteLength < 8) {
         return;
     }
-    if (Frame_Object_Url) {
-        try {
-            URL.revokeObjectURL(Frame_Object_Url);
-        } catch (E) {}
-        Frame_Object_Url = null;
+    var View = new DataView(Data);
+    var Kind = View.getUint8(0);
+    if (Kind !== 1) {
+        return;
+    }
+    var Mime_Type = Frame_Mime_Types[View.getUint8(1)] || "image/png";
+    var Width = View.getUint16(2);
+    var Height = View.getUint16(4);
+    var Count = View.getUint16(6);
+    var Offset = 8;
+    var Rects = [];
+    for (var Index_Rect = 0; Index_Rect < Count; Index_Rect++) {
+        if (Offset + 12 > Data.byteLength) {
+            return;
+        }
+        var Rect_X = View.getUint16(Offset);
+        var Rect_Y = View.getUint16(Offset + 2);
+        var Length = View.getUint32(Offset + 8);
+        Offset += 12;
+        if (Offset + Length > Data.byteLength) {
+            return;
+        }
+        var Blob_Obj = new Blob([new Uint8Array(Data, Offset, Length)], { type: Mime_Type });
+        Rects.push({ X: Rect_X, Y: Rect_Y, Blob: Blob_Obj });
+        Offset += Length;
     }
-    var Blob_Obj = new Blob([Data], { type: "image/png" });
-    Frame_Object_Url = URL.createObjectURL(Blob_Obj);
-    Screen_Image.src = Frame_Object_Url;
+    var Ack = Input_Ack_Pending;
+    Input_Ack_Pending = null;
+    var Decoded = Promise.all(Rects.map(function(Rect) {
+        return createImageBitmap(Rect.Blob);
+    }));
+    var Previous = Frame_Draw_Chain || Promise.resolve();
+    Frame_Draw_Chain = Previous.then(function() {
+        return Decoded;
+    }).then(function(Bitmaps) {
+        if (Screen_Image.width !== Width || Screen_Image.height !== Height) {
+            Screen_Image.width = Width;
+            Screen_Image.height = Height;
+            Apply_Scale_Mode();
+        }
+        for (var Index_Bitmap = 0; Index_Bitmap < Bitmaps.length; Index_Bitmap++) {
+            Screen_Context.drawImage(Bitmaps[Index_Bitmap], Rects[Index_Bitmap].X, Rects[Index_Bitmap].Y);
+            if (Bitmaps[Index_Bitmap].close) {
+                Bitmaps[Index_Bitmap].close();
+            }
+        }
+        if (Ack) {
+            window.requestAnimationFrame(function() {
+                Record_Input_Latency(Ack);
+            });
+        }
+    }).catch(function(E) {});
 }
 
 function Handle_Disconnect() {
@@ -1496,7 +2389,7 @@ function Handle_Disconnect() {
     Clear_Control_Message();
     Hide_Force_Control_Prompt();
     Update_Control_UI();
-    if (Login_Overlay) {
+    if (Login_Overlay && !Resume_Token) {
         Login_Overlay.style.display = "flex";
     }
     Set_Status_State("red");
@@ -1504,10 +2397,23 @@ function Handle_Disconnect() {
         Reconnect_Timer = setTimeout(function() {
             Reconnect_Timer = null;
             Start_Connection();
-        }, 2000);
+        }, Reconnect_Delay());
     }
 }
 
+function Reconnect_Delay() {
+    var Ceiling = Math.min(Reconnect_Max_Delay, Reconnect_Base_Delay * Math.pow(2, Reconnect_Attempts));
+    var Delay = Math.random() * Ceiling;
+    if (Reconnect_Retry_After > 0) {
+        Delay = Math.max(Delay, Reconnect_Retry_After * 1000 * (1 + Math.random() * 0.5));
+    }
+    Reconnect_Retry_After = 0;
+    if (Reconnect_Attempts < 16) {
+        Reconnect_Attempts += 1;
+    }
+    return Math.min(Delay, Reconnect_Max_Delay);
+}
+
 function Handle_Monitors(Msg) {
     var Count = Msg.Count;
     var Active = Msg.Active;
@@ -1577,25 +2483,55 @@ function Apply_Scale_Mode() {
     if (!Screen_Image) {
         return;
     }
+    Screen_Image.style.maxWidth = "none";
+    Screen_Image.style.maxHeight = "none";
+    Screen_Image.style.objectFit = "fill";
     if (Scale_Mode === "actual") {
-        Screen_Image.style.maxWidth = "none";
-        Screen_Image.style.maxHeight = "none";
-        Screen_Image.style.width = "auto";
-        Screen_Image.style.height = "auto";
-        Screen_Image.style.objectFit = "none";
+        Screen_Image.style.width = Screen_Image.width + "px";
+        Screen_Image.style.height = Screen_Image.height + "px";
     } else if (Scale_Mode === "stretch") {
-        Screen_Image.style.maxWidth = "100%";
-        Screen_Image.style.maxHeight = "100%";
         Screen_Image.style.width = "100%";
         Screen_Image.style.height = "100%";
-        Screen_Image.style.objectFit = "fill";
     } else {
-        Screen_Image.style.maxWidth = "100%";
-        Screen_Image.style.maxHeight = "100%";
-        Screen_Image.style.width = "";
-        Screen_Image.style.height = "";
-        Screen_Image.style.objectFit = "contain";
+        var View_Width = window.innerWidth;
+        var View_Height = window.innerHeight;
+        var Aspect = Screen_Image.width / Math.max(1, Screen_Image.height);
+        if (View_Width / Math.max(1, View_Height) > Aspect) {
+            Screen_Image.style.height = View_Height + "px";
+            Screen_Image.style.width = Math.round(View_Height * Aspect) + "px";
+        } else {
+            Screen_Image.style.width = View_Width + "px";
+            Screen_Image.style.height = Math.round(View_Width / Aspect) + "px";
+        }
+    }
+}
+
+function Build_Viewport_Message() {
+    return {
+        Type: "Viewport",
+        Width: window.innerWidth,
+        Height: window.innerHeight,
+        Ratio: window.devicePixelRatio || 1,
+        Mode: Scale_Mode
+    };
+}
+
+function Send_Viewport() {
+    if (!Login_Authenticated || !Web_Socket || Web_Socket.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    Web_Socket.send(JSON.stringify(Build_Viewport_Message()));
+}
+
+function Handle_Window_Resize(E) {
+    Apply_Scale_Mode();
+    if (Viewport_Timer !== null) {
+        clearTimeout(Viewport_Timer);
     }
+    Viewport_Timer = setTimeout(function() {
+        Viewport_Timer = null;
+        Send_Viewport();
+    }, 250);
 }
 
 function Update_Scale_Buttons() {
@@ -1621,6 +2557,7 @@ function Set_Scale_Mode(Mode) {
     Scale_Mode = Mode;
     Apply_Scale_Mode();
     Update_Scale_Buttons();
+    Send_Viewport();
     Schedule_Side_Bar_Auto_Close();
 }
 
@@ -1654,14 +2591,8 @@ function Handle_Mouse_Event(E) {
     } else {
         return;
     }
-    var Msg = {
-        Type: "Click",
-        X: X,
-        Y: Y,
-        Button: Button,
-        Action: Action
-    };
-    Web_Socket.send(JSON.stringify(Msg));
+    Flush_Mouse_Move();
+    Send_Mouse_Input(Action, Button, X, Y);
     E.preventDefault();
 }
 
@@ -1679,17 +2610,94 @@ function Handle_Mouse_Move(E) {
     if (Y < 0) Y = 0;
     if (X > 1) X = 1;
     if (Y > 1) Y = 1;
-    var Msg = {
-        Type: "Click",
-        X: X,
-        Y: Y,
-        Button: Mouse_Button,
-        Action: "move"
-    };
-    Web_Socket.send(JSON.stringify(Msg));
+    Mouse_Pending_Move = [X, Y];
+    if (Mouse_Move_Frame === null) {
+        Mouse_Move_Frame = window.requestAnimationFrame(Flush_Mouse_Move);
+    }
     E.preventDefault();
 }
 
+function Flush_Mouse_Move() {
+    if (Mouse_Move_Frame !== null) {
+        window.cancelAnimationFrame(Mouse_Move_Frame);
+        Mouse_Move_Frame = null;
+    }
+    var Move = Mouse_Pending_Move;
+    Mouse_Pending_Move = null;
+    if (!Move || !Web_Socket || Web_Socket.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    Send_Mouse_Input("move", Mouse_Button, Move[0], Move[1]);
+}
+
+function Input_Clock() {
+    return Math.round(performance.now()) >>> 0;
+}
+
+function Next_Input_Seq() {
+    Input_Seq = (Input_Seq + 1) >>> 0;
+    return Input_Seq;
+}
+
+function Record_Input_Latency(Ack, Unchanged) {
+    var Latency = (Input_Clock() - Ack.Time) >>> 0;
+    if (Latency >= 60000) {
+        return;
+    }
+    var Samples = Unchanged ? Input_Unchanged_Samples : Input_Latency_Samples;
+    if (Samples.length < 200) {
+        Samples.push(Latency);
+    }
+    if (Input_Latency_Timer === null) {
+        Input_Latency_Timer = setTimeout(Send_Input_Latency, 2000);
+    }
+}
+
+function Send_Input_Latency() {
+    Input_Latency_Timer = null;
+    var Samples = Input_Latency_Samples;
+    var Unchanged = Input_Unchanged_Samples;
+    Input_Latency_Samples = [];
+    Input_Unchanged_Samples = [];
+    if ((!Samples.length && !Unchanged.length) || !Login_Authenticated || !Web_Socket || Web_Socket.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    Web_Socket.send(JSON.stringify({ Type: "Input_Latency", Samples: Samples, Unchanged: Unchanged }));
+}
+
+function Send_Mouse_Input(Action, Button, X, Y) {
+    var Data = new DataView(new ArrayBuffer(15));
+    Data.setUint8(0, 1);
+    Data.setUint8(1, Input_Actions[Action]);
+    Data.setUint8(2, Input_Buttons[Button] || 0);
+    Data.setUint16(3, Math.round(X * 65535));
+    Data.setUint16(5, Math.round(Y * 65535));
+    Data.setUint32(7, Next_Input_Seq());
+    Data.setUint32(11, Input_Clock());
+    Web_Socket.send(Data.buffer);
+}
+
+function Encode_Input_Key(Key) {
+    return Input_Text_Encoder.encode(String(Key || "")).subarray(0, 255);
+}
+
+function Send_Key_Input(Action, Key) {
+    if (!Input_Text_Encoder) {
+        Web_Socket.send(JSON.stringify({ Type: "Key", Action: Action, Key: Key, Seq: Next_Input_Seq(), Time: Input_Clock() }));
+        return;
+    }
+    var Key_Bytes = Encode_Input_Key(Key);
+    var Data = new Uint8Array(11 + Key_Bytes.length);
+    var View = new DataView(Data.buffer);
+    Data[0] = 2;
+    Data[1] = Input_Actions[Action];
+    View.setUint32(2, Next_Input_Seq());
+    View.setUint32(6, Input_Clock());
+    Data[10] = Key_Bytes.length;
+    Data.set(Key_Bytes, 11);
+    Web_Socket.send(Data.buffer);
+}
+
 function Handle_Key_Down(E) {
     if (!Login_Authenticated || !Control_Active) {
         return;
@@ -1703,14 +2711,7 @@ function Handle_Key_Down(E) {
     if (E.repeat) {
         return;
     }
-    var Msg = {
-        Type: "Key",
-        Action: "down",
-        Key: E.key,
-        Code: E.code,
-        Key_Code: E.keyCode
-    };
-    Web_Socket.send(JSON.stringify(Msg));
+    Send_Key_Input("down", E.key || E.code);
     E.preventDefault();
 }
 
@@ -1721,14 +2722,7 @@ function Handle_Key_Up(E) {
     if (!Web_Socket || Web_Socket.readyState !== WebSocket.OPEN) {
         return;
     }
-    var Msg = {
-        Type: "Key",
-        Action: "up",
-        Key: E.key,
-        Code: E.code,
-        Key_Code: E.keyCode
-    };
-    Web_Socket.send(JSON.stringify(Msg));
+    Send_Key_Input("up", E.key || E.code);
     E.preventDefault();
 }
 
@@ -1742,11 +2736,30 @@ function Send_Key_Combo(Keys) {
     if (!Keys || !Keys.length) {
         return;
     }
-    var Msg = {
-        Type: "Key_Combo",
-        Keys: Keys
-    };
-    Web_Socket.send(JSON.stringify(Msg));
+    if (!Input_Text_Encoder) {
+        Web_Socket.send(JSON.stringify({ Type: "Key_Combo", Keys: Keys, Seq: Next_Input_Seq(), Time: Input_Clock() }));
+        return;
+    }
+    var Parts = [];
+    var Length = 10;
+    for (var I = 0; I < Keys.length && I < 255; I++) {
+        var Key_Bytes = Encode_Input_Key(Keys[I]);
+        Parts.push(Key_Bytes);
+        Length += 1 + Key_Bytes.length;
+    }
+    var Data = new Uint8Array(Length);
+    var View = new DataView(Data.buffer);
+    Data[0] = 3;
+    View.setUint32(1, Next_Input_Seq());
+    View.setUint32(5, Input_Clock());
+    Data[9] = Parts.length;
+    var Offset = 10;
+    for (var J = 0; J < Parts.length; J++) {
+        Data[Offset] = Parts[J].length;
+        Data.set(Parts[J], Offset + 1);
+        Offset += 1 + Parts[J].length;
+    }
+    Web_Socket.send(Data.buffer);
 }
 
 function Set_Fullscreen_State(State) {
@@ -1965,16 +2978,26 @@ function Submit_Login(E) {
 }
 
 function Handle_Login_Result(Msg) {
+    var Resumed = Resume_Pending;
+    Resume_Pending = false;
     if (!Msg.Success) {
+        if (Resumed) {
+            Resume_Token = null;
+            if (Login_Overlay) {
+                Login_Overlay.style.display = "flex";
+            }
+        }
         if (Login_Error) {
             Login_Error.textContent = Msg.Error || "Login failed";
         }
         return;
     }
+    Resume_Token = Msg.Resume || null;
+    Reconnect_Attempts = 0;
     Login_Authenticated = true;
     Control_Allowed = !!Msg.Control;
-    Control_Active = false;
-    Current_User_Name = Login_User ? Login_User.value.trim() : "";
+    Control_Active = !!Msg.Active;
+    Current_User_Name = Msg.User || (Login_User ? Login_User.value.trim() : "");
     if (Login_Overlay) {
         Login_Overlay.style.display = "none";
     }
@@ -1984,12 +3007,29 @@ function Handle_Login_Result(Msg) {
     Clear_Control_Message();
     Hide_Force_Control_Prompt();
     Update_Control_UI();
-    var Hello_Msg = { Type: "Hello" };
+    var Hello_Msg = Build_Hello_Message();
     if (Web_Socket && Web_Socket.readyState === WebSocket.OPEN) {
         Web_Socket.send(JSON.stringify(Hello_Msg));
     }
 }
 
+function Build_Hello_Message() {
+    var Msg = { Type: "Hello", Viewport: Build_Viewport_Message() };
+    var Query = new URLSearchParams(window.location.search);
+    var Format_Text = Query.get("format");
+    var Quality_Text = Query.get("quality");
+    if (Format_Text) {
+        Msg.Format = Format_Text.toLowerCase();
+    }
+    if (Quality_Text) {
+        var Quality_Value = parseInt(Quality_Text, 10);
+        if (!isNaN(Quality_Value)) {
+            Msg.Quality = Quality_Value;
+        }
+    }
+    return Msg;
+}
+
 function Request_Control(Force_Flag) {
     if (!Login_Authenticated) {
         return;
@@ -2157,6 +3197,7 @@ function Handle_Logout_Click(E) {
 
 function Start_Web_VNC() {
     Screen_Image = document.getElementById("Screen_Image");
+    Screen_Context = Screen_Image.getContext("2d");
     Monitor_Bar = document.getElementById("Monitor_Bar");
     Side_Bar = document.getElementById("Side_Bar");
     Side_Bar_Header = document.getElementById("Side_Bar_Header");
@@ -2305,6 +3346,7 @@ function Start_Web_VNC() {
     Screen_Image.addEventListener("mousemove", Handle_Mouse_Move);
     Screen_Image.addEventListener("contextmenu", function(E) { E.preventDefault(); });
 
+    window.addEventListener("resize", Handle_Window_Resize);
     window.addEventListener("keydown", Handle_Key_Down);
     window.addEventListener("keyup", Handle_Key_Up);
     window.addEventListener("blur", function(E) {
@@ -2327,10 +3369,1284 @@ window.addEventListener("load", Start_Web_VNC);
         return Html
         
 
-class Silent_Handle(CGIHTTPRequestHandler):
-    protocol_version = "HTTP/1.0"
-    CORS_Origin = None
-    Cache_Control = None
+class Frame_Pacer:
+
+    def __init__(self, Interval, Idle_Interval=None):
+        self.Base_Interval = max(0.001, float(Interval))
+        if Idle_Interval is None:
+            Idle_Interval = self.Base_Interval
+        self.Idle_Interval = max(self.Base_Interval, float(Idle_Interval))
+        self.Interval = self.Base_Interval
+        self._Wake_Event = threading.Event()
+        self.Reset()
+
+    def __str__(self):
+        return f"Frame_Pacer[Interval:{self.Base_Interval}]"
+
+    def __repr__(self):
+        return f"Frame_Pacer[Interval:{self.Base_Interval}]"
+
+    def Reset(self):
+        self._Deadline = None
+        self._Tick_Start = None
+        self._Window_Start = time.monotonic()
+        self._Window_Ticks = 0
+        self._Window_Late = 0.0
+        self._Window_Late_Max = 0.0
+        self._Window_Work = 0.0
+        self._Window_Work_Ticks = 0
+        self.Interval = self.Base_Interval
+        self.Ticks = 0
+        self.Ticks_Skipped = 0
+        self.Wakes = 0
+        self.Achieved_Fps = 0.0
+        self.Late_Avg = 0.0
+        self.Late_Max = 0.0
+        self.Work_Avg = 0.0
+
+    def Begin(self):
+        Now = time.monotonic()
+        if self._Deadline is None:
+            self._Deadline = Now
+        Late = max(0.0, Now - self._Deadline)
+        self._Tick_Start = Now
+        self.Ticks += 1
+        self._Window_Ticks += 1
+        self._Window_Late += Late
+        if Late > self._Window_Late_Max:
+            self._Window_Late_Max = Late
+        Elapsed = Now - self._Window_Start
+        if Elapsed >= 1.0:
+            self.Achieved_Fps = self._Window_Ticks / Elapsed
+            self.Late_Avg = self._Window_Late / self._Window_Ticks
+            self.Late_Max = self._Window_Late_Max
+            self.Work_Avg = self._Window_Work / max(1, self._Window_Work_Ticks)
+            self._Window_Start = Now
+            self._Window_Ticks = 0
+            self._Window_Late = 0.0
+            self._Window_Late_Max = 0.0
+            self._Window_Work = 0.0
+            self._Window_Work_Ticks = 0
+
+    def Activity(self, Changed):
+        if Changed:
+            self.Interval = self.Base_Interval
+        else:
+            self.Interval = min(self.Idle_Interval, self.Interval * 1.25)
+
+    def Wake(self):
+        self.Interval = self.Base_Interval
+        self._Wake_Event.set()
+
+    def Wait(self):
+        Now = time.monotonic()
+        if self._Tick_Start is not None:
+            self._Window_Work += Now - self._Tick_Start
+            self._Window_Work_Ticks += 1
+        if self._Deadline is None:
+            self._Deadline = Now
+        self._Deadline += self.Interval
+        if Now > self._Deadline:
+            Missed = int((Now - self._Deadline) / self.Interval) + 1
+            self.Ticks_Skipped += Missed
+            self._Deadline += Missed * self.Interval
+        while True:
+            Delay = self._Deadline - time.monotonic()
+            if Delay <= 0:
+                break
+            if self._Wake_Event.wait(Delay):
+                self._Wake_Event.clear()
+                Earliest = (self._Tick_Start or 0.0) + self.Base_Interval
+                if Earliest < self._Deadline:
+                    self._Deadline = Earliest
+                    self.Wakes += 1
+
+    def Stats(self):
+        return {
+            "Target_Fps": 1.0 / self.Base_Interval,
+            "Current_Fps": 1.0 / self.Interval,
+            "Achieved_Fps": self.Achieved_Fps,
+            "Late_Avg": self.Late_Avg,
+            "Late_Max": self.Late_Max,
+            "Work_Avg": self.Work_Avg,
+            "Ticks": self.Ticks,
+            "Ticks_Skipped": self.Ticks_Skipped,
+            "Wakes": self.Wakes
+        }
+
+class Link_Control:
+
+    Levels = [(1.0, 1, 0.0), (0.75, 1, 0.0), (0.5, 2, 0.0), (0.5, 2, 0.2), (0.35, 3, 0.5)]
+    Update_Interval = 1.0
+
+    def __init__(self):
+        self.Level = 0
+        self.Rtt = None
+        self.Rtt_Min = None
+        self.Throughput = 0.0
+        self.Backlog_Bytes = 0
+        self.Last_Update = 0.0
+        self.Last_Frame = 0.0
+        self._Healthy_Count = 0
+        self._Sent_Bytes = None
+        self._Dropped = None
+
+    def __str__(self):
+        return f"Link_Control[Level:{self.Level}]"
+
+    def __repr__(self):
+        return f"Link_Control[Level:{self.Level}]"
+
+    @property
+    def Scale(self):
+        return self.Levels[self.Level][1]
+
+    @property
+    def Interval(self):
+        return self.Levels[self.Level][2]
+
+    def Quality(self, Base_Quality):
+        return max(20, int(Base_Quality * self.Levels[self.Level][0]))
+
+    def Update(self, Now, Link_Stats):
+        Elapsed = Now - self.Last_Update
+        self.Last_Update = Now
+        Sent_Bytes = Link_Stats.get("Sent_Bytes", 0)
+        Dropped = Link_Stats.get("Dropped", 0)
+        self.Backlog_Bytes = Link_Stats.get("Backlog_Bytes", 0)
+        Rtt = Link_Stats.get("Rtt")
+        if Rtt is not None:
+            self.Rtt = Rtt
+            if self.Rtt_Min is None or Rtt < self.Rtt_Min:
+                self.Rtt_Min = Rtt
+        if self._Sent_Bytes is None or Elapsed <= 0 or Elapsed > self.Update_Interval * 10:
+            self._Sent_Bytes = Sent_Bytes
+            self._Dropped = Dropped
+            return False
+        Rate = (Sent_Bytes - self._Sent_Bytes) / Elapsed
+        self.Throughput = Rate if self.Throughput <= 0 else self.Throughput * 0.7 + Rate * 0.3
+        Dropped_Delta = Dropped - self._Dropped
+        self._Sent_Bytes = Sent_Bytes
+        self._Dropped = Dropped
+        Congested = False
+        if Dropped_Delta > 0:
+            Congested = True
+        elif self.Throughput > 0 and self.Backlog_Bytes > self.Throughput * 0.5:
+            Congested = True
+        elif self.Rtt is not None and self.Rtt_Min is not None and self.Rtt > self.Rtt_Min * 2 + 0.15:
+            Congested = True
+        if Congested:
+            self._Healthy_Count = 0
+            if self.Level < len(self.Levels) - 1:
+                self.Level += 1
+                return True
+            return False
+        self._Healthy_Count += 1
+        if self._Healthy_Count >= 5 and self.Level > 0:
+            self._Healthy_Count = 0
+            self.Level -= 1
+            return True
+        return False
+
+    def Stats(self):
+        return {"Level": self.Level, "Rtt": self.Rtt, "Throughput": self.Throughput, "Backlog_Bytes": self.Backlog_Bytes}
+
+class Client_Session:
+
+    __slots__ = ("Client", "User", "User_Key", "Authenticated", "Control_Allowed", "Has_Control", "Monitor_Index", "Need_Key_Frame", "Queued_Rects", "Skipped_Rects", "Format", "Quality", "Viewport", "Scale_Size", "Link", "Resume_Token", "First_Frame_Start", "First_Frame", "Input_Stamp", "Input_Tag", "Input_Latency", "_Indexed")
+
+    def __init__(self, Client):
+        self.Client = Client
+        self.User = ""
+        self.User_Key = None
+        self.Authenticated = False
+        self.Control_Allowed = False
+        self.Has_Control = False
+        self.Monitor_Index = 1
+        self.Need_Key_Frame = True
+        self.Queued_Rects = None
+        self.Skipped_Rects = []
+        self.Format = None
+        self.Quality = None
+        self.Viewport = None
+        self.Scale_Size = None
+        self.Link = None
+        self.Resume_Token = None
+        self.First_Frame_Start = None
+        self.First_Frame = None
+        self.Input_Stamp = None
+        self.Input_Tag = None
+        self.Input_Latency = None
+        self._Indexed = None
+
+    def __str__(self):
+        return f"Client_Session[User:{self.User}][Monitor:{self.Monitor_Index}]"
+
+    def __repr__(self):
+        return f"Client_Session[User:{self.User}][Monitor:{self.Monitor_Index}]"
+
+class Session_Registry:
+
+    def __init__(self):
+        self.Controller_Key = None
+        self.Controller_Name = None
+        self._Lock = threading.Lock()
+        self._Sessions = {}
+        self._By_User = {}
+        self._By_Monitor = {}
+        self._Viewers = ()
+
+    def __str__(self):
+        return f"Session_Registry[Sessions:{len(self._Sessions)}]"
+
+    def __repr__(self):
+        return f"Session_Registry[Sessions:{len(self._Sessions)}]"
+
+    def __len__(self):
+        return len(self._Sessions)
+
+    def Get(self, Client):
+        return self._Sessions.get(Client)
+
+    def Open(self, Client):
+        with self._Lock:
+            Session = self._Sessions.get(Client)
+            if Session is None:
+                Session = Client_Session(Client)
+                self._Sessions[Client] = Session
+            return Session
+
+    def Close(self, Client):
+        with self._Lock:
+            Session = self._Sessions.pop(Client, None)
+            if Session is not None:
+                self._Unindex(Session)
+            return Session
+
+    def Close_User(self, User_Key):
+        with self._Lock:
+            Sessions = self._By_User.get(User_Key, ())
+            for Session in Sessions:
+                self._Sessions.pop(Session.Client, None)
+                self._Unindex(Session)
+            return Sessions
+
+    def Login(self, Session, User, User_Key, Control_Allowed):
+        with self._Lock:
+            Session.User = User
+            Session.User_Key = User_Key
+            Session.Authenticated = True
+            Session.Control_Allowed = bool(Control_Allowed)
+            Session.Has_Control = False
+            Session.Need_Key_Frame = True
+            self._Index(Session)
+
+    def Logout(self, Session):
+        with self._Lock:
+            Session.Authenticated = False
+            Session.Control_Allowed = False
+            Session.Has_Control = False
+            self._Unindex(Session)
+
+    def Subscribe(self, Session, Monitor_Index):
+        with self._Lock:
+            Session.Monitor_Index = Monitor_Index
+            Session.Need_Key_Frame = True
+            if Session._Indexed is not None:
+                self._Index(Session)
+
+    def Viewers(self, Monitor_Index=None):
+        if Monitor_Index is None:
+            return self._Viewers
+        return self._By_Monitor.get(Monitor_Index, ())
+
+    def By_User(self, User_Key):
+        return self._By_User.get(User_Key, ())
+
+    def Set_Controller(self, User_Key, User_Name):
+        with self._Lock:
+            self.Controller_Key = User_Key
+            self.Controller_Name = User_Name if User_Key is not None else None
+
+    def Controllers(self):
+        return tuple(Session for Session in self.By_User(self.Controller_Key) if Session.Control_Allowed and Session.Has_Control)
+
+    def _Index(self, Session):
+        self._Unindex(Session)
+        if self._Sessions.get(Session.Client) is not Session:
+            return
+        Indexed = (Session.User_Key, Session.Monitor_Index)
+        self._By_User[Indexed[0]] = self._By_User.get(Indexed[0], ()) + (Session,)
+        self._By_Monitor[Indexed[1]] = self._By_Monitor.get(Indexed[1], ()) + (Session,)
+        self._Viewers = self._Viewers + (Session,)
+        Session._Indexed = Indexed
+
+    def _Unindex(self, Session):
+        Indexed = Session._Indexed
+        if Indexed is None:
+            return
+        Session._Indexed = None
+        for Index, Key in ((self._By_User, Indexed[0]), (self._By_Monitor, Indexed[1])):
+            Remaining = tuple(Other for Other in Index.get(Key, ()) if Other is not Session)
+            if Remaining:
+                Index[Key] = Remaining
+            else:
+                Index.pop(Key, None)
+        self._Viewers = tuple(Other for Other in self._Viewers if Other is not Session)
+
+class Encode_Pool:
+
+    Batch_Min_Rows = 64
+    Result_Timeout = 5.0
+    _Attached = collections.OrderedDict()
+
+    def __init__(self, Workers=0):
+        self.Workers = max(0, int(Workers or 0))
+        self.Jobs = 0
+        self.Failed = 0
+        self._Pool = None
+        self._Buffers = {}
+
+    def __str__(self):
+        return f"Encode_Pool[Workers:{self.Workers}]"
+
+    def __repr__(self):
+        return f"Encode_Pool[Workers:{self.Workers}]"
+
+    @property
+    def Active(self):
+        return self._Pool is not None
+
+    def Start(self):
+        if self.Workers < 1 or shared_memory is None or self._Pool is not None:
+            return self.Active
+        Methods = multiprocessing.get_all_start_methods()
+        Context = multiprocessing.get_context("fork" if "fork" in Methods else None)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        except Exception:
+            pass
+        try:
+            self._Pool = Context.Pool(self.Workers)
+        except Exception:
+            self._Pool = None
+        return self.Active
+
+    def Close(self):
+        if self._Pool is not None:
+            try:
+                self._Pool.terminate()
+            except Exception:
+                pass
+            self._Pool = None
+        for Buffer_Key in list(self._Buffers.keys()):
+            self.Release(Buffer_Key)
+
+    def Stage(self, Buffer_Key, Raw):
+        Length = len(Raw)
+        Buffer = self._Buffers.get(Buffer_Key)
+        if Buffer is None or Buffer.size < Length:
+            self.Release(Buffer_Key)
+            Buffer = shared_memory.SharedMemory(create=True, size=max(1, Length))
+            self._Buffers[Buffer_Key] = Buffer
+        Buffer.buf[:Length] = Raw
+        return (Buffer.name, Length)
+
+    def Release(self, Buffer_Key):
+        Buffer = self._Buffers.pop(Buffer_Key, None)
+        if Buffer is None:
+            return
+        try:
+            Buffer.close()
+            Buffer.unlink()
+        except Exception:
+            pass
+
+    def Submit(self, Frame_Encoder, Staged, Width, Height, Rects):
+        if len(Rects) < self.Workers:
+            Rects = self._Split_Rects(Rects)
+        Batches = [[] for Batch_Index in range(min(self.Workers, len(Rects)))]
+        Loads = [0] * len(Batches)
+        Order = sorted(range(len(Rects)), key=lambda Index: Rects[Index][2] * Rects[Index][3], reverse=True)
+        for Index in Order:
+            Batch_Index = Loads.index(min(Loads))
+            Batches[Batch_Index].append(Index)
+            Loads[Batch_Index] += Rects[Index][2] * Rects[Index][3]
+        Tasks = []
+        for Batch in Batches:
+            if not Batch:
+                continue
+            Batch.sort()
+            Batch_Rects = [Rects[Index] for Index in Batch]
+            Tasks.append((Batch, self._Pool.apply_async(Encode_Pool._Encode, (Staged[0], Staged[1], Frame_Encoder, Width, Height, Batch_Rects))))
+            self.Jobs += 1
+        return Encode_Job(self, struct.pack("!BBHHH", 1, Frame_Encoder.Format, Width, Height, len(Rects)), Rects, Tasks)
+
+    def Stats(self):
+        return {"Workers": self.Workers if self.Active else 0, "Jobs": self.Jobs, "Failed": self.Failed}
+
+    def _Split_Rects(self, Rects):
+        Split = []
+        Bands = max(1, -(-self.Workers // max(1, len(Rects))))
+        for X, Y, Rect_Width, Rect_Height in Rects:
+            Band_Height = max(self.Batch_Min_Rows, -(-Rect_Height // Bands))
+            for Band_Y in range(Y, Y + Rect_Height, Band_Height):
+                Split.append((X, Band_Y, Rect_Width, min(Band_Height, Y + Rect_Height - Band_Y)))
+        return Split
+
+    @staticmethod
+    def _Encode(Buffer_Name, Length, Frame_Encoder, Width, Height, Rects):
+        Attached = Encode_Pool._Attached
+        Buffer = Attached.get(Buffer_Name)
+        if Buffer is None:
+            Buffer = shared_memory.SharedMemory(name=Buffer_Name)
+            Attached[Buffer_Name] = Buffer
+            while len(Attached) > 16:
+                Old_Name, Old_Buffer = Attached.popitem(last=False)
+                try:
+                    Old_Buffer.close()
+                except Exception:
+                    pass
+        Raw = Buffer.buf[:Length]
+        return [b"".join(Frame_Encoder.Encode(Raw, Width, Height, X, Y, Rect_Width, Rect_Height)) for X, Y, Rect_Width, Rect_Height in Rects]
+
+class Encode_Job:
+
+    def __init__(self, Pool, Header, Rects, Tasks):
+        self._Pool = Pool
+        self._Header = Header
+        self._Rects = Rects
+        self._Tasks = Tasks
+        self._Data = None
+
+    def __str__(self):
+        return f"Encode_Job[Rects:{len(self._Rects)}]"
+
+    def __repr__(self):
+        return f"Encode_Job[Rects:{len(self._Rects)}]"
+
+    def Result(self):
+        if self._Data is not None:
+            return self._Data
+        Encoded = [None] * len(self._Rects)
+        try:
+            for Batch, Task in self._Tasks:
+                for Index, Data in zip(Batch, Task.get(self._Pool.Result_Timeout)):
+                    Encoded[Index] = Data
+        except Exception:
+            self._Pool.Failed += 1
+            self._Data = ()
+            return self._Data
+        Parts = [self._Header]
+        for (X, Y, Rect_Width, Rect_Height), Data in zip(self._Rects, Encoded):
+            Parts.append(struct.pack("!HHHHI", X, Y, Rect_Width, Rect_Height, len(Data)))
+            Parts.append(Data)
+        self._Data = tuple(Parts)
+        return self._Data
+
+class Frame_Ring:
+
+    Header = struct.Struct("!QQ")
+
+    def __init__(self, Size=32 << 20, Name=None):
+        self.Size = max(1 << 16, int(Size))
+        self.Published = 0
+        self._Head = 0
+        if Name is None:
+            self._Buffer = shared_memory.SharedMemory(create=True, size=self.Size)
+        else:
+            self._Buffer = shared_memory.SharedMemory(name=Name)
+        self.Name = self._Buffer.name
+
+    def __str__(self):
+        return f"Frame_Ring[Size:{self.Size}]"
+
+    def __repr__(self):
+        return f"Frame_Ring[Size:{self.Size}]"
+
+    def Publish(self, Seq, Parts):
+        Length = sum(len(Part) for Part in Parts)
+        if self.Header.size + Length > self.Size:
+            return None
+        Offset = self._Head
+        if Offset + self.Header.size + Length > self.Size:
+            Offset = 0
+        Buffer = self._Buffer.buf
+        self.Header.pack_into(Buffer, Offset, Seq, Length)
+        Position = Offset + self.Header.size
+        for Part in Parts:
+            Buffer[Position:Position + len(Part)] = Part
+            Position += len(Part)
+        self._Head = Position
+        self.Published += 1
+        return Offset
+
+    def Read(self, Offset, Seq, Length):
+        Buffer = self._Buffer.buf
+        Start = Offset + self.Header.size
+        if Start + Length > len(Buffer) or self.Header.unpack_from(Buffer, Offset) != (Seq, Length):
+            return None
+        Data = bytes(Buffer[Start:Start + Length])
+        if self.Header.unpack_from(Buffer, Offset) != (Seq, Length):
+            return None
+        return Data
+
+    def Close(self, Unlink=False):
+        try:
+            self._Buffer.close()
+            if Unlink:
+                self._Buffer.unlink()
+        except Exception:
+            pass
+
+class Shard_Socket:
+
+    Start_Timeout = 10.0
+
+    def __init__(self, Port, IP="", Workers=2, Ring_Size=32 << 20, **Options):
+        self._Port = Port
+        self._IP = IP
+        self.Workers = max(1, int(Workers))
+        self._Ring_Size = int(Ring_Size)
+        if Options.get("Max_Clients"):
+            Options["Max_Clients"] = -(-int(Options["Max_Clients"]) // self.Workers)
+        self._Options = Options
+        self._Ring = None
+        self._Running = False
+        self._Reader_Thread = None
+        self._Processes = []
+        self._Connections = []
+        self._Send_Locks = []
+        self._Worker_Stats = []
+        self._Known = []
+        self._Client_Stats = {}
+        self._Outstanding = {}
+        self._Outstanding_Lock = threading.Lock()
+        self._Inbound = queue.Queue()
+        self._Seq = 0
+        self._Lost = 0
+
+    def __str__(self):
+        return f"Shard_Socket[Port:{self._Port}, Workers:{self.Workers}]"
+
+    def __repr__(self):
+        return f"Shard_Socket[Port:{self._Port}, Workers:{self.Workers}]"
+
+    @staticmethod
+    def Supported():
+        return shared_memory is not None and hasattr(socket, "SO_REUSEPORT")
+
+    def Start(self):
+        self._Ring = Frame_Ring(self._Ring_Size)
+        Methods = multiprocessing.get_all_start_methods()
+        Context = multiprocessing.get_context("fork" if "fork" in Methods else None)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        except Exception:
+            pass
+        for Index in range(self.Workers):
+            Connection, Child_Connection = Context.Pipe()
+            Process = Context.Process(target=Shard_Worker.Main, args=(Index, self._Port, self._IP, self._Options, self._Ring.Name, self._Ring.Size, Child_Connection), daemon=True)
+            Process.start()
+            Child_Connection.close()
+            self._Processes.append(Process)
+            self._Connections.append(Connection)
+            self._Send_Locks.append(threading.Lock())
+            self._Worker_Stats.append({})
+            self._Known.append(set())
+        for Connection in self._Connections:
+            Message = None
+            try:
+                if Connection.poll(self.Start_Timeout):
+                    Message = Connection.recv()
+            except Exception:
+                Message = None
+            if Message is None or Message[0] != "Ready":
+                self.Close()
+                raise OSError(Message[1] if Message else "socket worker did not start")
+        self._Running = True
+        self._Reader_Thread = threading.Thread(target=self._Read_Loop, daemon=True)
+        self._Reader_Thread.start()
+
+    def Close(self):
+        self._Running = False
+        for Index in range(len(self._Connections)):
+            self._Command(Index, ("Stop",))
+        for Process in self._Processes:
+            Process.join(2.0)
+            if Process.is_alive():
+                Process.terminate()
+        for Connection in self._Connections:
+            try:
+                Connection.close()
+            except Exception:
+                pass
+        self._Processes = []
+        self._Connections = []
+        self._Send_Locks = []
+        self._Worker_Stats = []
+        self._Known = []
+        if self._Ring is not None:
+            self._Ring.Close(True)
+            self._Ring = None
+
+    def Close_Client(self, Client):
+        return self._Command(Client[0], ("Close", Client[1]))
+
+    def Pending(self, Client, Replace_Key):
+        return Replace_Key in self._Outstanding.get(Client, ())
+
+    def Ping(self, Client):
+        return self._Command(Client[0], ("Ping", Client[1]))
+
+    def Client_Stats(self, Client):
+        return self._Client_Stats.get(Client)
+
+    def Stats(self):
+        Totals = {"Workers": sum(1 for Process in self._Processes if Process.is_alive()), "Frames_Published": self._Ring.Published if self._Ring is not None else 0, "Frames_Lost": self._Lost}
+        for Worker_Stats in list(self._Worker_Stats):
+            for Name, Value in Worker_Stats.items():
+                Totals[Name] = Totals.get(Name, 0) + Value
+        return Totals
+
+    def Receive(self, Client=None):
+        try:
+            return self._Inbound.get(timeout=0.1)
+        except queue.Empty:
+            return None, None
+
+    def Send(self, Client, Reply, Replace_Key=None, Compress=None):
+        if isinstance(Reply, (tuple, list)):
+            Reply = b"".join(Reply)
+        elif isinstance(Reply, (bytearray, memoryview)):
+            Reply = bytes(Reply)
+        return self._Command(Client[0], ("Send", Client[1], Reply, Replace_Key, Compress))
+
+    def Broadcast(self, Clients, Reply, Replace_Key=None):
+        Binary = not isinstance(Reply, str)
+        if not Binary:
+            Parts = (Reply.encode("utf-8"),)
+        elif isinstance(Reply, (tuple, list)):
+            Parts = Reply
+        else:
+            Parts = (Reply,)
+        self._Seq += 1
+        Seq = self._Seq
+        Offset = self._Ring.Publish(Seq, Parts)
+        Length = sum(len(Part) for Part in Parts)
+        Inline = b"".join(Parts) if Offset is None else None
+        Groups = {}
+        for Client in Clients:
+            Groups.setdefault(Client[0], []).append(Client[1])
+        Sent = 0
+        for Index, Client_Ids in Groups.items():
+            if Replace_Key is not None:
+                with self._Outstanding_Lock:
+                    for Client_Id in Client_Ids:
+                        self._Outstanding.setdefault((Index, Client_Id), {})[Replace_Key] = Seq
+            if self._Command(Index, ("Frame", Client_Ids, Seq, Offset, Length, Inline, Replace_Key, Binary)):
+                Sent += len(Client_Ids)
+        return Sent
+
+    def _Command(self, Index, Message):
+        try:
+            with self._Send_Locks[Index]:
+                self._Connections[Index].send(Message)
+            return True
+        except Exception:
+            return False
+
+    def _Read_Loop(self):
+        Alive = {Connection: Index for Index, Connection in enumerate(self._Connections)}
+        while self._Running and Alive:
+            try:
+                Ready = multiprocessing.connection.wait(list(Alive.keys()), 0.5)
+            except Exception:
+                break
+            for Connection in Ready:
+                Index = Alive[Connection]
+                try:
+                    Message = Connection.recv()
+                except Exception:
+                    del Alive[Connection]
+                    self._Worker_Lost(Index)
+                    continue
+                try:
+                    self._Handle(Index, Message)
+                except Exception:
+                    pass
+
+    def _Handle(self, Index, Message):
+        Kind = Message[0]
+        if Kind == "Message":
+            Client = (Index, Message[1])
+            if Message[2] is None:
+                self._Forget(Client)
+            else:
+                self._Known[Index].add(Client)
+            self._Inbound.put((Client, Message[2]))
+        elif Kind == "Drained":
+            with self._Outstanding_Lock:
+                for Client_Id, Replace_Key, Seq in Message[1]:
+                    Keys = self._Outstanding.get((Index, Client_Id))
+                    if Keys is not None and Keys.get(Replace_Key) == Seq:
+                        del Keys[Replace_Key]
+        elif Kind == "Lost":
+            self._Lost += 1
+            with self._Outstanding_Lock:
+                for Client_Id in Message[1]:
+                    self._Outstanding.setdefault((Index, Client_Id), {})[Message[2]] = 0
+        elif Kind == "Stats":
+            for Client_Id, Client_Stats in Message[1].items():
+                if (Index, Client_Id) in self._Known[Index]:
+                    self._Client_Stats[(Index, Client_Id)] = Client_Stats
+            self._Worker_Stats[Index] = Message[2]
+
+    def _Forget(self, Client):
+        self._Known[Client[0]].discard(Client)
+        self._Client_Stats.pop(Client, None)
+        with self._Outstanding_Lock:
+            self._Outstanding.pop(Client, None)
+
+    def _Worker_Lost(self, Index):
+        for Client in list(self._Known[Index]):
+            self._Forget(Client)
+            self._Inbound.put((Client, None))
+        self._Worker_Stats[Index] = {}
+
+class Shard_Worker:
+
+    Stats_Interval = 0.5
+
+    def __init__(self, Index, Port, IP, Options, Ring_Name, Ring_Size, Connection):
+        self.Index = Index
+        self._Connection = Connection
+        self._Send_Lock = threading.Lock()
+        self._Ring = Frame_Ring(Ring_Size, Ring_Name)
+        self._Socket = HTTP.Socket(Port, IP=IP, Reuse_Port=True, On_Sent=self._On_Sent, **Options)
+        self._Clients = {}
+        self._Ids = {}
+        self._Next_Id = 0
+        self._Sequences = {}
+        self._Drained = collections.deque()
+        self._Drained_Event = threading.Event()
+        self._Running = False
+
+    def __str__(self):
+        return f"Shard_Worker[Index:{self.Index}]"
+
+    def __repr__(self):
+        return f"Shard_Worker[Index:{self.Index}]"
+
+    @staticmethod
+    def Main(Index, Port, IP, Options, Ring_Name, Ring_Size, Connection):
+        Worker = None
+        try:
+            Worker = Shard_Worker(Index, Port, IP, Options, Ring_Name, Ring_Size, Connection)
+            Worker.Run()
+        except KeyboardInterrupt:
+            pass
+        except Exception as Error:
+            try:
+                Connection.send(("Failed", str(Error)))
+            except Exception:
+                pass
+        finally:
+            if Worker is not None:
+                Worker.Close()
+
+    def Run(self):
+        self._Socket.Start()
+        self._Running = True
+        self._Report(("Ready",))
+        threading.Thread(target=self._Receive_Loop, daemon=True).start()
+        threading.Thread(target=self._Report_Loop, daemon=True).start()
+        while self._Running:
+            try:
+                Message = self._Connection.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                self._Handle(Message)
+            except Exception:
+                pass
+        self._Running = False
+
+    def Close(self):
+        self._Running = False
+        try:
+            self._Socket.Close()
+        except Exception:
+            pass
+        self._Ring.Close()
+        try:
+            self._Connection.close()
+        except Exception:
+            pass
+
+    def _Handle(self, Message):
+        Kind = Message[0]
+        if Kind == "Frame":
+            Client_Ids, Seq, Offset, Length, Inline, Replace_Key, Binary = Message[1:]
+            Data = Inline if Offset is None else self._Ring.Read(Offset, Seq, Length)
+            if Data is None:
+                self._Report(("Lost", Client_Ids, Replace_Key))
+                return
+            Clients = [(Client_Id, self._Clients.get(Client_Id)) for Client_Id in Client_Ids]
+            Clients = [(Client_Id, Client) for Client_Id, Client in Clients if Client is not None]
+            self._Socket.Broadcast([Client for Client_Id, Client in Clients], Data if Binary else Data.decode("utf-8"), Replace_Key)
+            if Replace_Key is not None:
+                for Client_Id, Client in Clients:
+                    self._Sequences[(Client_Id, Replace_Key)] = Seq
+                    self._On_Sent(Client, Replace_Key)
+        elif Kind == "Send":
+            Client = self._Clients.get(Message[1])
+            if Client is not None:
+                self._Socket.Send(Client, Message[2], Message[3], Message[4])
+        elif Kind == "Ping":
+            Client = self._Clients.get(Message[1])
+            if Client is not None:
+                self._Socket.Ping(Client)
+        elif Kind == "Close":
+            Client = self._Clients.get(Message[1])
+            if Client is not None:
+                self._Socket.Close_Client(Client)
+        elif Kind == "Stop":
+            self._Running = False
+
+    def _On_Sent(self, Client, Replace_Key):
+        Client_Id = self._Ids.get(Client)
+        Seq = self._Sequences.get((Client_Id, Replace_Key))
+        if Seq is None or self._Socket.Pending(Client, Replace_Key):
+            return
+        self._Drained.append((Client_Id, Replace_Key, Seq))
+        self._Drained_Event.set()
+
+    def _Receive_Loop(self):
+        while self._Running:
+            try:
+                Client, Payload = self._Socket.Receive()
+            except Exception:
+                continue
+            if Client is None:
+                continue
+            Client_Id = self._Ids.get(Client)
+            if Client_Id is None:
+                if Payload is None:
+                    continue
+                self._Next_Id += 1
+                Client_Id = self._Next_Id
+                self._Ids[Client] = Client_Id
+                self._Clients[Client_Id] = Client
+            if Payload is None:
+                self._Ids.pop(Client, None)
+                self._Clients.pop(Client_Id, None)
+                for Key in [Key for Key in list(self._Sequences.keys()) if Key[0] == Client_Id]:
+                    self._Sequences.pop(Key, None)
+            self._Report(("Message", Client_Id, Payload))
+
+    def _Report_Loop(self):
+        Next_Stats = 0.0
+        while self._Running:
+            self._Drained_Event.wait(self.Stats_Interval)
+            self._Drained_Event.clear()
+            Drained = []
+            while self._Drained:
+                Drained.append(self._Drained.popleft())
+            if Drained:
+                self._Report(("Drained", Drained))
+            Now = time.monotonic()
+            if Now < Next_Stats:
+                continue
+            Next_Stats = Now + self.Stats_Interval
+            Client_Stats = {}
+            for Client_Id, Client in list(self._Clients.items()):
+                Stats = self._Socket.Client_Stats(Client)
+                if Stats is not None:
+                    Client_Stats[Client_Id] = Stats
+            self._Report(("Stats", Client_Stats, self._Socket.Stats()))
+
+    def _Report(self, Message):
+        try:
+            with self._Send_Lock:
+                self._Connection.send(Message)
+        except Exception:
+            self._Running = False
+
+class Encoder:
+
+    Formats = {"png": 0, "jpeg": 1, "webp": 2}
+
+    def __str__(self):
+        return f"Encoder[]"
+
+    def __repr__(self):
+        return f"Encoder[]"
+
+    def __dir__(self):
+        return []
+
+    @property
+    def __dict__(self):
+        return {}
+
+    @staticmethod
+    def Create(Format_Name, Quality=80, Level=6, Strategy="default"):
+        Format_Text = str(Format_Name or "png").lower()
+        if Image is not None:
+            if Format_Text == "jpeg" or Format_Text == "jpg":
+                return Encoder.JPEG(Quality)
+            if Format_Text == "webp":
+                return Encoder.WEBP(Quality)
+        return Encoder.PNG(Level, Strategy)
+
+    @staticmethod
+    def Region_To_Rgb(Raw, Width, X, Y, Region_Width, Region_Height, Target=None):
+        Stride = Width * 4
+        if X == 0 and Region_Width == Width:
+            Source = Raw
+            Start = Y * Stride
+            End = Start + Region_Height * Stride
+            if not isinstance(Raw, (bytes, bytearray)):
+                Source = bytes(memoryview(Raw)[Start:End])
+                Start = 0
+                End = len(Source)
+        else:
+            Raw_View = memoryview(Raw)
+            Row_Length = Region_Width * 4
+            Rows = []
+            Row_Start = Y * Stride + X * 4
+            for Row_Index in range(Region_Height):
+                Rows.append(Raw_View[Row_Start:Row_Start + Row_Length])
+                Row_Start += Stride
+            Source = b"".join(Rows)
+            Start = 0
+            End = len(Source)
+        Rgb_Length = Region_Width * Region_Height * 3
+        if Target is None or len(Target) != Rgb_Length:
+            Target = bytearray(Rgb_Length)
+        Target[0::3] = Source[Start + 2:End:4]
+        Target[1::3] = Source[Start + 1:End:4]
+        Target[2::3] = Source[Start:End:4]
+        return Target
+
+    @staticmethod
+    def Region_To_Image(Raw, Width, X, Y, Region_Width, Region_Height):
+        Stride = Width * 4
+        Band = memoryview(Raw)[Y * Stride:(Y + Region_Height) * Stride]
+        Frame_Image = Image.frombuffer("RGB", (Width, Region_Height), Band, "raw", "BGRX", 0, 1)
+        if X != 0 or Region_Width != Width:
+            Frame_Image = Frame_Image.crop((X, 0, X + Region_Width, Region_Height))
+        return Frame_Image
+
+    @staticmethod
+    def Scaled_Size(Width, Height, Target_Width, Target_Height):
+        if Image is not None:
+            return (max(1, min(Width, Target_Width)), max(1, min(Height, Target_Height)))
+        Divisor = max(1, min(Width // max(1, Target_Width), Height // max(1, Target_Height)))
+        return (max(1, Width // Divisor), max(1, Height // Divisor))
+
+    @staticmethod
+    def Scale(Raw, Width, Height, Scaled_Width, Scaled_Height):
+        if Image is not None:
+            Frame_Image = Image.frombuffer("RGBA", (Width, Height), Raw, "raw", "RGBA", 0, 1)
+            Frame_Image = Frame_Image.resize((Scaled_Width, Scaled_Height), Image.BILINEAR, reducing_gap=2.0)
+            return Frame_Image.tobytes()
+        Divisor = max(1, Width // Scaled_Width)
+        Stride = Width * 4
+        Row_Length = Scaled_Width * Divisor * 4
+        Raw_View = memoryview(Raw)
+        Rows = []
+        for Row_Index in range(Scaled_Height):
+            Row_Start = Row_Index * Divisor * Stride
+            Rows.append(Raw_View[Row_Start:Row_Start + Row_Length])
+        Source = b"".join(Rows)
+        Scaled_Raw = bytearray(Scaled_Width * Scaled_Height * 4)
+        Step = Divisor * 4
+        for Channel in range(4):
+            Scaled_Raw[Channel::4] = Source[Channel::Step]
+        return Scaled_Raw
+
+    class PNG:
+
+        Format = 0
+        Mime = "image/png"
+        Strategies = {"default": zlib.Z_DEFAULT_STRATEGY, "filtered": zlib.Z_FILTERED, "huffman": zlib.Z_HUFFMAN_ONLY, "rle": zlib.Z_RLE}
+
+        def __init__(self, Level=6, Strategy="default"):
+            self._Level = max(0, min(9, int(Level)))
+            self._Strategy = self.Strategies.get(str(Strategy).lower(), zlib.Z_DEFAULT_STRATEGY)
+            self.Key = ("png", self._Level, self._Strategy)
+            self._Rgb = None
+            self._Scanlines = None
+
+        def __getstate__(self):
+            State = self.__dict__.copy()
+            State["_Rgb"] = None
+            State["_Scanlines"] = None
+            return State
+
+        def __str__(self):
+            return f"Encoder_PNG[Level:{self._Level}]"
+
+        def __repr__(self):
+            return f"Encoder_PNG[Level:{self._Level}]"
+
+        def Encode(self, Raw, Width, Height, X, Y, Region_Width, Region_Height):
+            self._Rgb = Encoder.Region_To_Rgb(Raw, Width, X, Y, Region_Width, Region_Height, self._Rgb)
+            Rgb = memoryview(self._Rgb)
+            Line_Length = Region_Width * 3
+            Scanlines_Length = Region_Height * (Line_Length + 1)
+            if self._Scanlines is None or len(self._Scanlines) < Scanlines_Length:
+                self._Scanlines = bytearray(Scanlines_Length)
+            Scanlines = memoryview(self._Scanlines)[:Scanlines_Length]
+            Source_Start = 0
+            Target_Start = 1
+            for Row_Index in range(Region_Height):
+                Scanlines[Target_Start - 1] = 0
+                Scanlines[Target_Start:Target_Start + Line_Length] = Rgb[Source_Start:Source_Start + Line_Length]
+                Source_Start += Line_Length
+                Target_Start += Line_Length + 1
+            Compressor = zlib.compressobj(self._Level, zlib.DEFLATED, 15, 9, self._Strategy)
+            Compressed = Compressor.compress(Scanlines)
+            Compressed_Tail = Compressor.flush()
+            Header = struct.pack("!2I5B", Region_Width, Region_Height, 8, 2, 0, 0, 0)
+            Crc = zlib.crc32(Compressed_Tail, zlib.crc32(Compressed, zlib.crc32(b"IDAT"))) & 0xFFFFFFFF
+            return (
+                b"\x89PNG\r\n\x1a\n" + self._Chunk(b"IHDR", Header) + struct.pack("!I", len(Compressed) + len(Compressed_Tail)) + b"IDAT",
+                Compressed,
+                Compressed_Tail + struct.pack("!I", Crc) + self._Chunk(b"IEND", b"")
+            )
+
+        def _Chunk(self, Chunk_Type, Data):
+            return struct.pack("!I", len(Data)) + Chunk_Type + Data + struct.pack("!I", zlib.crc32(Data, zlib.crc32(Chunk_Type)) & 0xFFFFFFFF)
+
+    class JPEG:
+
+        Format = 1
+        Mime = "image/jpeg"
+
+        def __init__(self, Quality=80):
+            self._Quality = max(1, min(100, int(Quality)))
+            self.Key = ("jpeg", self._Quality)
+
+        def __str__(self):
+            return f"Encoder_JPEG[Quality:{self._Quality}]"
+
+        def __repr__(self):
+            return f"Encoder_JPEG[Quality:{self._Quality}]"
+
+        def Encode(self, Raw, Width, Height, X, Y, Region_Width, Region_Height):
+            Frame_Image = Encoder.Region_To_Image(Raw, Width, X, Y, Region_Width, Region_Height)
+            Output = io.BytesIO()
+            Frame_Image.save(Output, format="JPEG", quality=self._Quality)
+            return (Output.getbuffer(),)
+
+    class WEBP:
+
+        Format = 2
+        Mime = "image/webp"
+
+        def __init__(self, Quality=80):
+            self._Quality = max(1, min(100, int(Quality)))
+            self.Key = ("webp", self._Quality)
+
+        def __str__(self):
+            return f"Encoder_WEBP[Quality:{self._Quality}]"
+
+        def __repr__(self):
+            return f"Encoder_WEBP[Quality:{self._Quality}]"
+
+        def Encode(self, Raw, Width, Height, X, Y, Region_Width, Region_Height):
+            Frame_Image = Encoder.Region_To_Image(Raw, Width, X, Y, Region_Width, Region_Height)
+            Output = io.BytesIO()
+            Frame_Image.save(Output, format="WEBP", quality=self._Quality, method=0)
+            return (Output.getbuffer(),)
+
+class Input:
+
+    Backends = ("auto", "xtest", "pyautogui")
+
+    def __str__(self):
+        return f"Input[]"
+
+    def __repr__(self):
+        return f"Input[]"
+
+    def __dir__(self):
+        return []
+
+    @property
+    def __dict__(self):
+        return {}
+
+    @staticmethod
+    def Create(Backend_Name="auto"):
+        Backend_Text = str(Backend_Name or "auto").lower()
+        if Backend_Text in ("auto", "xtest"):
+            try:
+                return Input.XTEST()
+            except Exception:
+                pass
+        return Input.PYAUTOGUI()
+
+    class PYAUTOGUI:
+
+        Name = "pyautogui"
+
+        def __str__(self):
+            return f"Input_PYAUTOGUI[]"
+
+        def __repr__(self):
+            return f"Input_PYAUTOGUI[]"
+
+        def Size(self):
+            Width, Height = pyautogui.size()
+            return (int(Width), int(Height))
+
+        def Move(self, X, Y):
+            pyautogui.moveTo(X, Y, _pause=False)
+
+        def Button(self, Button_Name, Down, X, Y):
+            if Down:
+                pyautogui.mouseDown(x=X, y=Y, button=Button_Name, _pause=False)
+            else:
+                pyautogui.mouseUp(x=X, y=Y, button=Button_Name, _pause=False)
+
+        def Key(self, Key_Name, Down):
+            if Down:
+                pyautogui.keyDown(Key_Name, _pause=False)
+            else:
+                pyautogui.keyUp(Key_Name, _pause=False)
+
+        def Press(self, Key_Name):
+            pyautogui.press(Key_Name, _pause=False)
+
+        def Hotkey(self, Keys):
+            pyautogui.hotkey(*Keys, _pause=False)
+
+        def Close(self):
+            pass
+
+    class XTEST:
+
+        Name = "xtest"
+        Buttons = {"left": 1, "middle": 2, "right": 3}
+        Keysyms = {"space": "space", "enter": "Return", "backspace": "BackSpace", "tab": "Tab", "esc": "Escape", "shift": "Shift_L", "ctrl": "Control_L", "alt": "Alt_L", "win": "Super_L", "up": "Up", "down": "Down", "left": "Left", "right": "Right", "delete": "Delete"}
+
+        def __init__(self, Display_Name=None):
+            X11_Path = ctypes.util.find_library("X11")
+            Xtst_Path = ctypes.util.find_library("Xtst")
+            if not X11_Path or not Xtst_Path:
+                raise OSError("libX11 or libXtst not found")
+            self._X11 = ctypes.CDLL(X11_Path)
+            self._Xtst = ctypes.CDLL(Xtst_Path)
+            self._X11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            self._X11.XOpenDisplay.restype = ctypes.c_void_p
+            self._X11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+            self._X11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+            self._X11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+            self._X11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+            self._X11.XStringToKeysym.restype = ctypes.c_ulong
+            self._X11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+            self._X11.XKeysymToKeycode.restype = ctypes.c_ubyte
+            self._X11.XkbKeycodeToKeysym.argtypes = [ctypes.c_void_p, ctypes.c_ubyte, ctypes.c_int, ctypes.c_int]
+            self._X11.XkbKeycodeToKeysym.restype = ctypes.c_ulong
+            self._X11.XFlush.argtypes = [ctypes.c_void_p]
+            self._X11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+            self._Xtst.XTestQueryExtension.argtypes = [ctypes.c_void_p] + [ctypes.POINTER(ctypes.c_int)] * 4
+            self._Xtst.XTestFakeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+            self._Xtst.XTestFakeButtonEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+            self._Xtst.XTestFakeKeyEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+            self._Display = self._X11.XOpenDisplay(Display_Name.encode("utf-8") if Display_Name else None)
+            if not self._Display:
+                raise OSError("cannot open X display")
+            Values = [ctypes.c_int() for Index in range(4)]
+            if not self._Xtst.XTestQueryExtension(self._Display, *[ctypes.byref(Value) for Value in Values]):
+                self._X11.XCloseDisplay(self._Display)
+                self._Display = None
+                raise OSError("XTEST extension not available")
+            self._Screen = self._X11.XDefaultScreen(self._Display)
+            self._Lock = threading.Lock()
+            self._Keycodes = {}
+
+        def __str__(self):
+            return f"Input_XTEST[]"
+
+        def __repr__(self):
+            return f"Input_XTEST[]"
+
+        def Size(self):
+            with self._Lock:
+                return (int(self._X11.XDisplayWidth(self._Display, self._Screen)), int(self._X11.XDisplayHeight(self._Display, self._Screen)))
+
+        def Move(self, X, Y):
+            with self._Lock:
+                self._Xtst.XTestFakeMotionEvent(self._Display, -1, int(X), int(Y), 0)
+                self._X11.XFlush(self._Display)
+
+        def Button(self, Button_Name, Down, X, Y):
+            with self._Lock:
+                self._Xtst.XTestFakeMotionEvent(self._Display, -1, int(X), int(Y), 0)
+                self._Xtst.XTestFakeButtonEvent(self._Display, self.Buttons.get(Button_Name, 1), bool(Down), 0)
+                self._X11.XFlush(self._Display)
+
+        def Key(self, Key_Name, Down):
+            self._Send_Keys([Key_Name], Down, not Down)
+
+        def Press(self, Key_Name):
+            self._Send_Keys([Key_Name], True, True)
+
+        def Hotkey(self, Keys):
+            self._Send_Keys(Keys, True, True)
+
+        def Close(self):
+            with self._Lock:
+                if self._Display:
+                    self._X11.XCloseDisplay(self._Display)
+                    self._Display = None
+
+        def _Send_Keys(self, Keys, Down, Up):
+            with self._Lock:
+                Codes = []
+                for Key_Name in Keys:
+                    Keycode, Needs_Shift = self._Keycode(Key_Name)
+                    if Keycode:
+                        if Needs_Shift:
+                            Codes.append(self._Keycode("shift")[0])
+                        Codes.append(Keycode)
+                if not Codes:
+                    return
+                if Down:
+                    for Keycode in Codes:
+                        self._Xtst.XTestFakeKeyEvent(self._Display, Keycode, True, 0)
+                if Up:
+                    for Keycode in reversed(Codes):
+                        self._Xtst.XTestFakeKeyEvent(self._Display, Keycode, False, 0)
+                self._X11.XFlush(self._Display)
+
+        def _Keycode(self, Key_Name):
+            Cached = self._Keycodes.get(Key_Name)
+            if Cached is not None:
+                return Cached
+            if len(Key_Name) == 1 and ord(Key_Name) < 256:
+                Keysym = ord(Key_Name)
+            else:
+                Keysym_Name = self.Keysyms.get(Key_Name)
+                if Keysym_Name is None and Key_Name.startswith("f") and Key_Name[1:].isdigit():
+                    Keysym_Name = "F" + Key_Name[1:]
+                Keysym = self._X11.XStringToKeysym(Keysym_Name.encode("ascii")) if Keysym_Name else 0
+            Keycode = self._X11.XKeysymToKeycode(self._Display, Keysym) if Keysym else 0
+            Needs_Shift = bool(Keycode) and self._X11.XkbKeycodeToKeysym(self._Display, Keycode, 0, 0) != Keysym and self._X11.XkbKeycodeToKeysym(self._Display, Keycode, 0, 1) == Keysym
+            self._Keycodes[Key_Name] = (Keycode, Needs_Shift)
+            return (Keycode, Needs_Shift)
+
+class Silent_Handle(CGIHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    CORS_Origin = None
+    Cache_Control = None
     Timeout = None
     Health_Path = None
     Allowed_Methods = None
@@ -2538,14 +4854,439 @@ class HTTP:
                 self._Server.server_close()
                 self._Server = None
 
+    class Client:
+
+        def __init__(self, Url, Timeout=10, Max_Message_Size=64 << 20):
+            Parsed = urllib.parse.urlparse(str(Url))
+            self._Url = str(Url)
+            self._Secure = Parsed.scheme in ("wss", "https")
+            self._Host = Parsed.hostname or "127.0.0.1"
+            self._Port = Parsed.port or (443 if self._Secure else 80)
+            self._Path = (Parsed.path or "/") + ("?" + Parsed.query if Parsed.query else "")
+            self._Timeout = Timeout
+            self.Max_Message_Size = int(Max_Message_Size)
+            self._Socket = None
+            self._Buffer = bytearray()
+            self._Send_Lock = threading.Lock()
+            self._Message_Op = None
+            self._Fragments = None
+
+        def __str__(self):
+            return f"HTTP_Client[Url:{self._Url}]"
+
+        def __repr__(self):
+            return f"HTTP_Client[Url:{self._Url}]"
+
+        def Connect(self):
+            Client = socket.create_connection((self._Host, self._Port), self._Timeout)
+            try:
+                if self._Secure:
+                    Client = ssl.create_default_context().wrap_socket(Client, server_hostname=self._Host)
+                Client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                Client_Key = base64.b64encode(os.urandom(16)).decode("ascii")
+                Request = (
+                    "GET " + self._Path + " HTTP/1.1\r\n"
+                    "Host: " + self._Host + ":" + str(self._Port) + "\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    "Sec-WebSocket-Key: " + Client_Key + "\r\n"
+                    "Sec-WebSocket-Version: 13\r\n"
+                    "\r\n"
+                )
+                Client.sendall(Request.encode("ascii"))
+                Response = bytearray()
+                while b"\r\n\r\n" not in Response:
+                    if len(Response) > 8192:
+                        raise ConnectionError("handshake response too large")
+                    Chunk = Client.recv(4096)
+                    if not Chunk:
+                        raise ConnectionError("closed during handshake")
+                    Response += Chunk
+                Header_End = Response.find(b"\r\n\r\n")
+                Lines = Response[:Header_End].decode("latin-1").split("\r\n")
+                if len(Lines[0].split()) < 2 or Lines[0].split()[1] != "101":
+                    raise ConnectionError("upgrade refused: " + Lines[0])
+                Headers = {}
+                for Line in Lines[1:]:
+                    Name, Separator, Value = Line.partition(":")
+                    Headers[Name.strip().lower()] = Value.strip()
+                Accept_Key = base64.b64encode(hashlib.sha1((Client_Key + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode("ascii")).digest()).decode("ascii")
+                if Headers.get("sec-websocket-accept") != Accept_Key:
+                    raise ConnectionError("bad accept key")
+            except Exception:
+                Client.close()
+                raise
+            self._Buffer = bytearray(Response[Header_End + 4:])
+            self._Socket = Client
+
+        def Close(self):
+            Client = self._Socket
+            self._Socket = None
+            if Client is None:
+                return
+            try:
+                with self._Send_Lock:
+                    Client.sendall(self._Frame(0x8, b""))
+            except Exception:
+                pass
+            try:
+                Client.close()
+            except Exception:
+                pass
+
+        def Send(self, Reply):
+            if isinstance(Reply, (bytes, bytearray, memoryview)):
+                Frame = self._Frame(0x2, bytes(Reply))
+            else:
+                Frame = self._Frame(0x1, str(Reply).encode("utf-8"))
+            with self._Send_Lock:
+                if self._Socket is None:
+                    raise ConnectionError("not connected")
+                self._Socket.sendall(Frame)
+
+        def Receive(self, Timeout=None):
+            while True:
+                Frame = self._Parse()
+                if Frame is None:
+                    Client = self._Socket
+                    if Client is None:
+                        raise ConnectionError("not connected")
+                    if not (self._Secure and Client.pending()):
+                        Readable, Writable, Errored = select.select([Client], [], [], Timeout)
+                        if not Readable:
+                            return None
+                    Chunk = Client.recv(65536)
+                    if not Chunk:
+                        raise ConnectionError("upstream closed")
+                    self._Buffer += Chunk
+                    continue
+                Fin, Op, Payload = Frame
+                if Op == 0x9:
+                    with self._Send_Lock:
+                        self._Socket.sendall(self._Frame(0xA, Payload))
+                    continue
+                if Op == 0xA:
+                    continue
+                if Op == 0x8:
+                    raise ConnectionError("upstream closed")
+                if Op == 0x0:
+                    if self._Fragments is None:
+                        raise ValueError("unexpected continuation")
+                    self._Fragments += Payload
+                    if len(self._Fragments) > self.Max_Message_Size:
+                        raise ValueError("message too large")
+                    if not Fin:
+                        continue
+                    Op = self._Message_Op
+                    Payload = bytes(self._Fragments)
+                    self._Message_Op = None
+                    self._Fragments = None
+                elif not Fin:
+                    self._Message_Op = Op
+                    self._Fragments = bytearray(Payload)
+                    continue
+                return Payload.decode("utf-8") if Op == 0x1 else Payload
+
+        def _Parse(self):
+            Buffer = self._Buffer
+            if len(Buffer) < 2:
+                return None
+            Byte1 = Buffer[0]
+            Byte2 = Buffer[1]
+            Length = Byte2 & 0x7F
+            Offset = 2
+            if Length == 126:
+                if len(Buffer) < 4:
+                    return None
+                Length = struct.unpack_from("!H", Buffer, 2)[0]
+                Offset = 4
+            elif Length == 127:
+                if len(Buffer) < 10:
+                    return None
+                Length = struct.unpack_from("!Q", Buffer, 2)[0]
+                Offset = 10
+            if Length > self.Max_Message_Size:
+                raise ValueError("message too large")
+            Mask = None
+            if Byte2 & 0x80:
+                if len(Buffer) < Offset + 4:
+                    return None
+                Mask = bytes(Buffer[Offset:Offset + 4])
+                Offset += 4
+            if len(Buffer) < Offset + Length:
+                return None
+            Payload = bytes(Buffer[Offset:Offset + Length])
+            del Buffer[:Offset + Length]
+            if Mask is not None:
+                Payload = HTTP.Frame_Reader.Unmask(Payload, Mask)
+            return (bool(Byte1 & 0x80), Byte1 & 0x0F, Payload)
+
+        def _Frame(self, Op, Data):
+            Length = len(Data)
+            if Length < 126:
+                Header = struct.pack("!BB", 0x80 | Op, 0x80 | Length)
+            elif Length < (1 << 16):
+                Header = struct.pack("!BBH", 0x80 | Op, 0x80 | 126, Length)
+            else:
+                Header = struct.pack("!BBQ", 0x80 | Op, 0x80 | 127, Length)
+            Mask = os.urandom(4)
+            return Header + Mask + HTTP.Frame_Reader.Unmask(Data, Mask)
+
+    class Deflate:
+
+        Tail = b"\x00\x00\xff\xff"
+        Window_Bits = 12
+        Mem_Level = 5
+
+        def __init__(self, Server_Takeover=True, Client_Takeover=True, Server_Bits=15, Client_Bits=15, Level=6, Client_Bits_Offered=False):
+            self.Server_Takeover = Server_Takeover
+            self.Client_Takeover = Client_Takeover
+            self.Server_Bits = Server_Bits
+            self.Client_Bits = Client_Bits
+            self.Level = Level
+            self.Response = "permessage-deflate"
+            if not Server_Takeover:
+                self.Response += "; server_no_context_takeover"
+            if not Client_Takeover:
+                self.Response += "; client_no_context_takeover"
+            if Server_Bits != 15:
+                self.Response += "; server_max_window_bits=" + str(Server_Bits)
+            if Client_Bits_Offered and Client_Bits != 15:
+                self.Response += "; client_max_window_bits=" + str(Client_Bits)
+            self._Compressor = None
+            self._Decompressor = None
+
+        def __str__(self):
+            return f"HTTP_Deflate[Takeover:{self.Server_Takeover}]"
+
+        def __repr__(self):
+            return f"HTTP_Deflate[Takeover:{self.Server_Takeover}]"
+
+        @staticmethod
+        def Negotiate(Offers, Context_Takeover=True):
+            for Offer in str(Offers or "").split(","):
+                Params = [Param.strip() for Param in Offer.split(";")]
+                if Params[0].lower() != "permessage-deflate":
+                    continue
+                Server_Takeover = Context_Takeover
+                Client_Takeover = Context_Takeover
+                Server_Bits = HTTP.Deflate.Window_Bits
+                Client_Bits = 15
+                Client_Bits_Offered = False
+                Valid = True
+                for Param in Params[1:]:
+                    if not Param:
+                        continue
+                    Name, Separator, Value = Param.partition("=")
+                    Name = Name.strip().lower()
+                    Value = Value.strip().strip('"')
+                    if Name == "server_no_context_takeover":
+                        Server_Takeover = False
+                    elif Name == "client_no_context_takeover":
+                        Client_Takeover = False
+                    elif Name == "server_max_window_bits":
+                        if not Value.isdigit() or not 9 <= int(Value) <= 15:
+                            Valid = False
+                        else:
+                            Server_Bits = min(Server_Bits, int(Value))
+                    elif Name == "client_max_window_bits":
+                        if Value and (not Value.isdigit() or not 8 <= int(Value) <= 15):
+                            Valid = False
+                        else:
+                            Client_Bits_Offered = True
+                            Client_Bits = min(HTTP.Deflate.Window_Bits, int(Value or 15))
+                    else:
+                        Valid = False
+                if Valid:
+                    return HTTP.Deflate(Server_Takeover, Client_Takeover, Server_Bits, Client_Bits, Client_Bits_Offered=Client_Bits_Offered)
+            return None
+
+        def Compress(self, Data):
+            if self._Compressor is None or not self.Server_Takeover:
+                self._Compressor = zlib.compressobj(self.Level, zlib.DEFLATED, -self.Server_Bits, self.Mem_Level)
+            Parts = Data if isinstance(Data, (tuple, list)) else (Data,)
+            Compressed = [self._Compressor.compress(Part) for Part in Parts]
+            Compressed.append(self._Compressor.flush(zlib.Z_SYNC_FLUSH))
+            Output = b"".join(Compressed)
+            if Output.endswith(self.Tail):
+                Output = Output[:-4]
+            return Output
+
+        def Decompress(self, Payload, Max_Size):
+            if self._Decompressor is None or not self.Client_Takeover:
+                self._Decompressor = zlib.decompressobj(-max(9, self.Client_Bits))
+            Output = self._Decompressor.decompress(bytes(Payload) + self.Tail, Max_Size + 1)
+            if len(Output) > Max_Size:
+                raise ValueError(1009)
+            return Output
+
+    class Frame_Reader:
+
+        def __init__(self, Loop, Client, Max_Message_Size=1 << 20, Buffer_Size=65536, Initial=None, Deflate=None):
+            Initial = Initial or b""
+            self._Loop = Loop
+            self._Client = Client
+            self._Deflate = Deflate
+            self._Compressed = False
+            self.Max_Message_Size = int(Max_Message_Size)
+            self._Buffer = bytearray(max(int(Buffer_Size), len(Initial), 16))
+            self._View = memoryview(self._Buffer)
+            self._Start = 0
+            self._End = len(Initial)
+            self._Buffer[:self._End] = Initial
+            self._Message_Op = None
+            self._Fragments = None
+
+        def __str__(self):
+            return f"HTTP_Frame_Reader[Buffer:{len(self._Buffer)}]"
+
+        def __repr__(self):
+            return f"HTTP_Frame_Reader[Buffer:{len(self._Buffer)}]"
+
+        async def Read(self):
+            while True:
+                if not await self._Fill(2):
+                    return None
+                Byte1 = self._Buffer[self._Start]
+                Byte2 = self._Buffer[self._Start + 1]
+                Fin = Byte1 & 0x80
+                Op = Byte1 & 0x0F
+                Length = Byte2 & 0x7F
+                Header_Length = 2
+                if Length == 126:
+                    Header_Length += 2
+                elif Length == 127:
+                    Header_Length += 8
+                if Byte2 & 0x80:
+                    Header_Length += 4
+                if not await self._Fill(Header_Length):
+                    return None
+                Offset = self._Start + 2
+                if Length == 126:
+                    Length = struct.unpack_from("!H", self._Buffer, Offset)[0]
+                    Offset += 2
+                elif Length == 127:
+                    Length = struct.unpack_from("!Q", self._Buffer, Offset)[0]
+                    Offset += 8
+                Mask = bytes(self._Buffer[Offset:Offset + 4]) if Byte2 & 0x80 else None
+                self._Start += Header_Length
+                if Byte1 & 0x30 or (Byte1 & 0x40 and (self._Deflate is None or Op == 0x0 or Op >= 0x8)):
+                    raise ValueError(1002)
+                if Op >= 0x8:
+                    if not Fin or Length > 125:
+                        raise ValueError(1002)
+                elif Op == 0x0:
+                    if self._Fragments is None:
+                        raise ValueError(1002)
+                elif Op in (0x1, 0x2):
+                    if self._Fragments is not None:
+                        raise ValueError(1002)
+                else:
+                    raise ValueError(1002)
+                if Length + (len(self._Fragments) if self._Fragments is not None and Op < 0x8 else 0) > self.Max_Message_Size:
+                    raise ValueError(1009)
+                Payload = await self._Read_Payload(Length)
+                if Payload is None:
+                    return None
+                if Mask is not None:
+                    Payload = self.Unmask(Payload, Mask)
+                if Op >= 0x8:
+                    return (Op, bytes(Payload))
+                if Op == 0x0:
+                    self._Fragments += Payload
+                    if not Fin:
+                        continue
+                    Op = self._Message_Op
+                    Payload = self._Fragments
+                    self._Message_Op = None
+                    self._Fragments = None
+                else:
+                    self._Compressed = bool(Byte1 & 0x40)
+                    if not Fin:
+                        self._Message_Op = Op
+                        self._Fragments = bytearray(Payload)
+                        continue
+                if self._Compressed:
+                    self._Compressed = False
+                    Payload = self._Deflate.Decompress(Payload, self.Max_Message_Size)
+                return (Op, Payload)
+
+        @staticmethod
+        def Unmask(Payload, Mask):
+            Length = len(Payload)
+            if not Length:
+                return b""
+            Key = (Mask * ((Length >> 2) + 1))[:Length]
+            return (int.from_bytes(Payload, "little") ^ int.from_bytes(Key, "little")).to_bytes(Length, "little")
+
+        async def _Fill(self, Count):
+            if self._End - self._Start >= Count:
+                return True
+            if self._Start + Count > len(self._Buffer):
+                Available = self._End - self._Start
+                self._Buffer[:Available] = bytes(self._View[self._Start:self._End])
+                self._Start = 0
+                self._End = Available
+            while self._End - self._Start < Count:
+                Received = await self._Loop.sock_recv_into(self._Client, self._View[self._End:])
+                if not Received:
+                    return False
+                self._End += Received
+            return True
+
+        async def _Read_Payload(self, Length):
+            if Length <= len(self._Buffer):
+                if not await self._Fill(Length):
+                    return None
+                Payload = self._Buffer[self._Start:self._Start + Length]
+                self._Start += Length
+                return Payload
+            Payload = bytearray(Length)
+            Payload_View = memoryview(Payload)
+            Received = self._End - self._Start
+            Payload_View[:Received] = self._View[self._Start:self._End]
+            self._Start = 0
+            self._End = 0
+            while Received < Length:
+                Chunk_Size = await self._Loop.sock_recv_into(self._Client, Payload_View[Received:])
+                if not Chunk_Size:
+                    return None
+                Received += Chunk_Size
+            return Payload
+
     class Socket:
-        
-        def __init__(self, Port, IP="", Timeout=30):
+
+        Busy_Backlog = 1024
+        Inbound_Limit = 64
+
+        def __init__(self, Port, IP="", Timeout=30, Queue_Size=64, Handshake_Timeout=5.0, Max_Header_Size=8192, Max_Pending=256, Max_Message_Size=1 << 20, Deflate=False, Context_Takeover=True, Reuse_Port=False, On_Sent=None, Max_Clients=0, Retry_After=5.0):
             self._IP = IP
             self._Port = Port
             self._Timeout = Timeout
+            self._Queue_Size = max(1, int(Queue_Size))
+            self._Handshake_Timeout = max(0.1, float(Handshake_Timeout))
+            self._Max_Header_Size = max(1024, int(Max_Header_Size))
+            self._Max_Pending = max(1, int(Max_Pending))
+            self._Max_Message_Size = max(125, int(Max_Message_Size))
+            self._Deflate = bool(Deflate)
+            self._Context_Takeover = bool(Context_Takeover)
+            self._Reuse_Port = bool(Reuse_Port)
+            self._On_Sent = On_Sent
+            self._Max_Clients = max(0, int(Max_Clients or 0))
+            self._Retry_After = max(0.0, float(Retry_After or 0))
+            self._Busy_Rejected = 0
+            self._Pending = collections.OrderedDict()
+            self._Pending_Free = None
+            self._Handshakes_Rejected = 0
+            self._Handshakes_Timed_Out = 0
+            self._Handshakes_Failed = 0
             self._Server_Socket = None
+            self._Loop = None
+            self._Loop_Thread = None
             self._Clients = set()
+            self._Outbound = {}
+            self._Outbound_Lock = threading.Lock()
+            self._Inbound = queue.Queue()
 
         def __str__(self):
             return f"HTTP_Socket[Port:{self._Port}, IP:{self._IP}]"
@@ -2563,193 +5304,485 @@ class HTTP:
         def Start(self):
             Server_Socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             Server_Socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self._Reuse_Port:
+                Server_Socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             Server_Socket.bind((self._IP, self._Port))
-            Server_Socket.listen(100)
+            Server_Socket.listen(1024)
+            Server_Socket.setblocking(False)
             self._Server_Socket = Server_Socket
+            self._Loop = asyncio.SelectorEventLoop()
+            self._Loop_Thread = threading.Thread(target=self._Run_Loop, daemon=True)
+            self._Loop_Thread.start()
 
         def Close(self):
-            if self._Server_Socket:
-                try:
-                    self._Server_Socket.close()
-                except Exception:
-                    pass
-                self._Server_Socket = None
+            Loop = self._Loop
+            if Loop is None:
+                return
             for Client in list(self._Clients):
-                try:
-                    Client.close()
-                except Exception:
-                    pass
-            self._Clients = set()
-
-        def Close_Client(self, Client):
-            try:
-                self._Send_Frame(Client, 0x8, b"")
-            except Exception:
-                pass
-            try:
-                Client.close()
-            except Exception:
-                pass
+                self._Drop_Client(Client, False)
             try:
-                self._Clients.discard(Client)
+                Loop.call_soon_threadsafe(self._Shutdown)
             except Exception:
                 pass
+            if self._Loop_Thread is not None and self._Loop_Thread is not threading.current_thread():
+                self._Loop_Thread.join(2.0)
+            self._Loop = None
+            self._Loop_Thread = None
+            self._Server_Socket = None
+
+        def Close_Client(self, Client):
+            self._Drop_Client(Client)
+
+        def Pending(self, Client, Replace_Key):
+            Outbound = self._Outbound.get(Client)
+            if Outbound is None:
+                return False
+            with Outbound["Lock"]:
+                for Item in Outbound["Items"]:
+                    if Item[2] == Replace_Key:
+                        return True
+            return False
+
+        def Ping(self, Client):
+            return self._Enqueue(Client, 0x9, struct.pack("!d", time.monotonic()))
+
+        def Client_Stats(self, Client):
+            Outbound = self._Outbound.get(Client)
+            if Outbound is None:
+                return None
+            with Outbound["Lock"]:
+                return {
+                    "Backlog": len(Outbound["Items"]),
+                    "Backlog_Bytes": Outbound["Backlog_Bytes"],
+                    "Sent_Bytes": Outbound["Sent_Bytes"],
+                    "Dropped": Outbound["Dropped"],
+                    "Rtt": Outbound["Rtt"],
+                    "Inbound": Outbound["Inbound"],
+                    "Inbound_Waits": Outbound["Inbound_Waits"],
+                    "Deflate": Outbound["Deflate"] is not None
+                }
+
+        def Stats(self):
+            return {
+                "Clients": len(self._Clients),
+                "Pending_Handshakes": len(self._Pending),
+                "Handshakes_Rejected": self._Handshakes_Rejected,
+                "Handshakes_Timed_Out": self._Handshakes_Timed_Out,
+                "Handshakes_Failed": self._Handshakes_Failed,
+                "Busy_Rejected": self._Busy_Rejected
+            }
 
         def Receive(self, Client=None):
-            if self._Server_Socket is None:
+            if self._Loop is None:
                 return None, None
-            Select_Timeout = 0.1
             try:
-                Sockets_List = [self._Server_Socket]
-                if self._Clients:
-                    Sockets_List.extend(self._Clients)
-                Readable_Sockets, _, _ = select.select(Sockets_List, [], [], Select_Timeout)
-            except Exception:
-                return None, None
-            if not Readable_Sockets:
+                Client, Payload = self._Inbound.get(timeout=0.1)
+            except queue.Empty:
                 return None, None
-            if self._Server_Socket in Readable_Sockets:
+            Outbound = self._Outbound.get(Client)
+            if Outbound is not None and Payload is not None:
+                with Outbound["Lock"]:
+                    Outbound["Inbound"] -= 1
+                    Resume = Outbound["Inbound"] == self.Inbound_Limit - 1
+                if Resume:
+                    self._Wake_Reader(Outbound)
+            return Client, Payload
+
+        def Send(self, Client, Reply, Replace_Key=None, Compress=None):
+            if isinstance(Reply, (bytes, bytearray)):
+                return self._Enqueue(Client, 0x2, bytes(Reply), Replace_Key, Compress=bool(Compress))
+            if isinstance(Reply, (tuple, list)):
+                return self._Enqueue(Client, 0x2, tuple(Reply), Replace_Key, Compress=bool(Compress))
+            return self._Enqueue(Client, 0x1, str(Reply).encode("utf-8"), Replace_Key, Compress=Compress is None or bool(Compress))
+
+        def Broadcast(self, Clients, Reply, Replace_Key=None):
+            if isinstance(Reply, (bytes, bytearray)):
+                Wire = self._Frame_Parts(0x2, bytes(Reply))
+                Op = 0x2
+            elif isinstance(Reply, (tuple, list)):
+                Wire = self._Frame_Parts(0x2, tuple(Reply))
+                Op = 0x2
+            else:
+                Wire = self._Frame_Parts(0x1, str(Reply).encode("utf-8"))
+                Op = 0x1
+            Length = self._Length(Wire)
+            Sent = 0
+            for Client in Clients:
+                if self._Enqueue(Client, Op, Wire, Replace_Key, True, Length):
+                    Sent += 1
+            return Sent
+
+        def _Run_Loop(self):
+            asyncio.set_event_loop(self._Loop)
+            self._Loop.create_task(self._Accept_Loop())
+            try:
+                self._Loop.run_forever()
+            finally:
                 try:
-                    New_Client, Address = self._Server_Socket.accept()
-                    New_Client.settimeout(self._Timeout)
-                    if self._Handshake(New_Client):
-                        self._Clients.add(New_Client)
-                    else:
-                        try:
-                            New_Client.close()
-                        except Exception:
-                            pass
+                    self._Loop.close()
                 except Exception:
                     pass
-                Readable_Sockets = [S for S in Readable_Sockets if S is not self._Server_Socket]
-                if not Readable_Sockets:
-                    return None, None
-            Selected_Client = None
-            if Client in Readable_Sockets:
-                Selected_Client = Client
-            else:
-                Selected_Client = Readable_Sockets[0]
+
+        def _Shutdown(self):
+            for Task in asyncio.all_tasks(self._Loop):
+                Task.cancel()
             try:
-                Frame = self._Decode_Frame(Selected_Client)
+                self._Server_Socket.close()
             except Exception:
-                self.Close_Client(Selected_Client)
-                return Selected_Client, None
-            if Frame is None:
-                self.Close_Client(Selected_Client)
-                return Selected_Client, None
-            Op_Code, Data = Frame
-            if Op_Code == 0x9:
+                pass
+            self._Loop.call_later(0.1, self._Loop.stop)
+
+        async def _Accept_Loop(self):
+            self._Pending_Free = asyncio.Event()
+            while True:
+                await self._Pending_Slot()
                 try:
-                    self._Send_Frame(Selected_Client, 0xA, Data)
-                except Exception:
-                    self.Close_Client(Selected_Client)
-                    return Selected_Client, None
-                return None, None
-            if Op_Code == 0x8:
-                self.Close_Client(Selected_Client)
-                return Selected_Client, None
-            if Op_Code == 0x1:
+                    New_Client, Address = await self._Loop.sock_accept(self._Server_Socket)
+                except asyncio.CancelledError:
+                    raise
+                except OSError:
+                    await asyncio.sleep(0.1)
+                    continue
+                New_Client.setblocking(False)
                 try:
-                    return Selected_Client, Data.decode("utf-8", "replace")
+                    New_Client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 except Exception:
-                    return Selected_Client, None
-            if Op_Code == 0x2:
-                return Selected_Client, Data
-            return Selected_Client, None
+                    pass
+                self._Pending[New_Client] = (self._Loop.create_task(self._Serve_Client(New_Client)), self._Loop.time())
 
-        def Send(self, Client, Reply):
-            if isinstance(Reply, (bytes, bytearray)):
+        async def _Pending_Slot(self):
+            while len(self._Pending) >= self._Max_Pending:
+                Oldest_Client, (Oldest_Task, Started) = next(iter(self._Pending.items()))
+                Wait = Started + self._Handshake_Timeout / 5 - self._Loop.time()
+                if Wait <= 0:
+                    self._Pending.pop(Oldest_Client, None)
+                    Oldest_Task.cancel()
+                    self._Handshakes_Rejected += 1
+                    return
+                self._Pending_Free.clear()
+                try:
+                    await asyncio.wait_for(self._Pending_Free.wait(), Wait)
+                except asyncio.TimeoutError:
+                    pass
+
+        async def _Serve_Client(self, Client):
+            Accepted = False
+            Result = None
+            try:
+                Result = await asyncio.wait_for(self._Handshake(Client), self._Handshake_Timeout)
+                Accepted = Result is not None
+            except asyncio.TimeoutError:
+                self._Handshakes_Timed_Out += 1
+            except Exception:
+                pass
+            finally:
+                self._Pending.pop(Client, None)
+                self._Pending_Free.set()
+                if not Accepted:
+                    try:
+                        Client.close()
+                    except Exception:
+                        pass
+            if not Accepted:
+                return
+            if (self._Max_Clients and len(self._Clients) >= self._Max_Clients) or self._Inbound.qsize() > self.Busy_Backlog:
+                self._Busy_Rejected += 1
+                Busy = json.dumps({"Type": "Busy", "Retry_After": self._Retry_After}, separators=(",", ":")).encode("utf-8")
                 try:
-                    self._Send_Frame(Client, 0x2, bytes(Reply))
-                    return True
+                    await self._Loop.sock_sendall(Client, b"".join(self._Frame_Parts(0x1, Busy)) + b"".join(self._Frame_Parts(0x8, struct.pack("!H", 1013))))
                 except Exception:
-                    self.Close_Client(Client)
-                    return False
-            else:
+                    pass
                 try:
-                    self._Send_Frame(Client, 0x1, str(Reply).encode("utf-8"))
-                    return True
+                    Client.close()
                 except Exception:
-                    self.Close_Client(Client)
+                    pass
+                return
+            Leftover, Deflate = Result
+            Outbound = self._Add_Client(Client, Deflate)
+            Outbound["Reader"] = asyncio.current_task()
+            Reader = HTTP.Frame_Reader(self._Loop, Client, self._Max_Message_Size, Initial=Leftover, Deflate=Deflate)
+            Close_Data = b""
+            try:
+                while not Outbound["Closed"]:
+                    Frame = await Reader.Read()
+                    if Frame is None:
+                        break
+                    Op_Code, Data = Frame
+                    if Op_Code == 0x9:
+                        self._Enqueue(Client, 0xA, Data)
+                    elif Op_Code == 0xA:
+                        if len(Data) == 8:
+                            Outbound["Rtt"] = max(0.0, time.monotonic() - struct.unpack("!d", Data)[0])
+                    elif Op_Code == 0x8:
+                        break
+                    elif Op_Code == 0x1:
+                        await self._Put_Inbound(Client, Outbound, Data.decode("utf-8", "replace"))
+                    elif Op_Code == 0x2:
+                        await self._Put_Inbound(Client, Outbound, Data)
+            except asyncio.CancelledError:
+                pass
+            except ValueError as Error:
+                Close_Data = struct.pack("!H", Error.args[0] if Error.args and isinstance(Error.args[0], int) else 1002)
+            except Exception:
+                pass
+            finally:
+                Outbound["Reader"] = None
+                self._Drop_Client(Client, Close_Data=Close_Data)
+
+        async def _Put_Inbound(self, Client, Outbound, Payload):
+            with Outbound["Lock"]:
+                Outbound["Inbound"] += 1
+                Full = Outbound["Inbound"] >= self.Inbound_Limit
+                if Full:
+                    Outbound["Inbound_Free"].clear()
+                    Outbound["Inbound_Waits"] += 1
+            self._Inbound.put((Client, Payload))
+            if Full:
+                await Outbound["Inbound_Free"].wait()
+
+        async def _Writer_Loop(self, Client, Outbound):
+            Lock = Outbound["Lock"]
+            Items = Outbound["Items"]
+            Wake = Outbound["Wake"]
+            try:
+                while True:
+                    Wake.clear()
+                    with Lock:
+                        if Items:
+                            Op, Data, Replace_Key, Length, Framed, Compress = Items.popleft()
+                            Outbound["Backlog_Bytes"] -= Length
+                        else:
+                            Op = None
+                    if Op is None:
+                        await Wake.wait()
+                        continue
+                    Rsv1 = False
+                    if Compress and not Framed and Outbound["Deflate"] is not None:
+                        Data = Outbound["Deflate"].Compress(Data)
+                        Rsv1 = True
+                    await self._Send_Frame(Client, Op, Data, Framed, Rsv1)
+                    Outbound["Sent_Bytes"] += Length
+                    if Replace_Key is not None and self._On_Sent is not None:
+                        try:
+                            self._On_Sent(Client, Replace_Key)
+                        except Exception:
+                            pass
+                    if Op == 0x8:
+                        break
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                self._Drop_Client(Client)
+            Reader = Outbound.get("Reader")
+            if Reader is not None and Reader is not asyncio.current_task():
+                Reader.cancel()
+            try:
+                Client.close()
+            except Exception:
+                pass
+
+        def _Drop_Client(self, Client, Notify=True, Close_Data=b""):
+            with self._Outbound_Lock:
+                Registered = Client in self._Clients
+                self._Clients.discard(Client)
+                Outbound = self._Outbound.pop(Client, None)
+            if Outbound is None:
+                return Registered
+            with Outbound["Lock"]:
+                Outbound["Closed"] = True
+                Outbound["Items"].clear()
+                Outbound["Items"].append((0x8, Close_Data, None, len(Close_Data), False, False))
+                Outbound["Backlog_Bytes"] = 0
+            self._Wake_Writer(Outbound)
+            self._Wake_Reader(Outbound)
+            if Registered and Notify:
+                self._Inbound.put((Client, None))
+            return Registered
+
+        def _Add_Client(self, Client, Deflate=None):
+            Outbound = {"Items": collections.deque(), "Lock": threading.Lock(), "Wake": asyncio.Event(), "Closed": False, "Backlog_Bytes": 0, "Sent_Bytes": 0, "Dropped": 0, "Rtt": None, "Reader": None, "Deflate": Deflate, "Inbound": 0, "Inbound_Free": asyncio.Event(), "Inbound_Waits": 0}
+            with self._Outbound_Lock:
+                self._Clients.add(Client)
+                self._Outbound[Client] = Outbound
+            self._Loop.create_task(self._Writer_Loop(Client, Outbound))
+            return Outbound
+
+        def _Wake_Writer(self, Outbound):
+            Loop = self._Loop
+            if Loop is None:
+                return
+            try:
+                if threading.current_thread() is self._Loop_Thread:
+                    Outbound["Wake"].set()
+                else:
+                    Loop.call_soon_threadsafe(Outbound["Wake"].set)
+            except RuntimeError:
+                pass
+
+        def _Wake_Reader(self, Outbound):
+            Loop = self._Loop
+            if Loop is None:
+                return
+            try:
+                if threading.current_thread() is self._Loop_Thread:
+                    Outbound["Inbound_Free"].set()
+                else:
+                    Loop.call_soon_threadsafe(Outbound["Inbound_Free"].set)
+            except RuntimeError:
+                pass
+
+        def _Enqueue(self, Client, Op, Data, Replace_Key=None, Framed=False, Length=None, Compress=False):
+            Outbound = self._Outbound.get(Client)
+            if Outbound is None:
+                return False
+            if Length is None:
+                Length = self._Length(Data)
+            with Outbound["Lock"]:
+                if Outbound["Closed"]:
                     return False
+                Items = Outbound["Items"]
+                Was_Empty = not Items
+                if Replace_Key is not None:
+                    for Item in list(Items):
+                        if Item[2] == Replace_Key:
+                            Items.remove(Item)
+                            Outbound["Backlog_Bytes"] -= Item[3]
+                            Outbound["Dropped"] += 1
+                if len(Items) >= self._Queue_Size:
+                    Overflow = True
+                else:
+                    Overflow = False
+                    Items.append((Op, Data, Replace_Key, Length, Framed, Compress))
+                    Outbound["Backlog_Bytes"] += Length
+            if Overflow:
+                self.Close_Client(Client)
+                return False
+            if Was_Empty:
+                self._Wake_Writer(Outbound)
+            return True
 
-        def _Handshake(self, Client):
-            Request_Raw = b""
-            while b"\r\n\r\n" not in Request_Raw:
-                Chunk = Client.recv(2048)
+        async def _Handshake(self, Client):
+            Request_Raw = bytearray()
+            while True:
+                Header_End = Request_Raw.find(b"\r\n\r\n")
+                if Header_End >= 0:
+                    break
+                if len(Request_Raw) >= self._Max_Header_Size:
+                    self._Handshakes_Failed += 1
+                    self._Reject(Client, "431 Request Header Fields Too Large")
+                    return None
+                Chunk = await self._Loop.sock_recv(Client, min(4096, self._Max_Header_Size - len(Request_Raw) + 3))
                 if not Chunk:
-                    return False
+                    self._Handshakes_Failed += 1
+                    return None
                 Request_Raw += Chunk
             try:
-                Lines = Request_Raw.decode("iso-8859-1").split("\r\n")
+                Lines = Request_Raw[:Header_End].decode("iso-8859-1").split("\r\n")
+                Request_Line = Lines[0].split()
                 Headers = {}
                 for Line in Lines[1:]:
-                    if not Line:
-                        continue
                     if ":" in Line:
                         Key, Value = Line.split(":", 1)
                         Headers[Key.strip().lower()] = Value.strip()
                 Client_Key = Headers.get("sec-websocket-key")
-                if not Client_Key:
-                    return False
+                if len(Request_Line) < 3 or Request_Line[0] != "GET" or Headers.get("upgrade", "").lower() != "websocket" or not Client_Key:
+                    self._Handshakes_Failed += 1
+                    self._Reject(Client, "400 Bad Request")
+                    return None
+                if Headers.get("sec-websocket-version", "13") != "13":
+                    self._Handshakes_Failed += 1
+                    self._Reject(Client, "426 Upgrade Required", "Sec-WebSocket-Version: 13\r\n")
+                    return None
+                Deflate = None
+                Extension_Header = ""
+                if self._Deflate:
+                    Deflate = HTTP.Deflate.Negotiate(Headers.get("sec-websocket-extensions", ""), self._Context_Takeover)
+                    if Deflate is not None:
+                        Extension_Header = "Sec-WebSocket-Extensions: " + Deflate.Response + "\r\n"
                 Accept_Key = base64.b64encode(hashlib.sha1((Client_Key + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode("ascii")).digest()).decode("ascii")
                 Response = (
                     "HTTP/1.1 101 Switching Protocols\r\n"
                     "Upgrade: websocket\r\n"
                     "Connection: Upgrade\r\n"
                     "Sec-WebSocket-Accept: " + Accept_Key + "\r\n"
+                    + Extension_Header +
                     "\r\n"
                 )
-                Client.sendall(Response.encode("ascii"))
-                return True
+                await self._Loop.sock_sendall(Client, Response.encode("ascii"))
+                return (bytes(Request_Raw[Header_End + 4:]), Deflate)
             except Exception:
-                return False
+                self._Handshakes_Failed += 1
+                return None
 
-        def _Recv_Exact(self, Client, Count):
-            Data = b""
-            while len(Data) < Count:
-                Chunk = Client.recv(Count - len(Data))
-                if not Chunk:
-                    return None
-                Data += Chunk
-            return Data
+        def _Reject(self, Client, Status, Extra_Headers=""):
+            try:
+                Client.send(("HTTP/1.1 " + Status + "\r\n" + Extra_Headers + "Connection: close\r\nContent-Length: 0\r\n\r\n").encode("ascii"))
+            except Exception:
+                pass
+            try:
+                Client.close()
+            except Exception:
+                pass
 
-        def _Decode_Frame(self, Client):
-            Header = self._Recv_Exact(Client, 2)
-            if not Header:
-                return None
-            Byte1, Byte2 = Header[0], Header[1]
-            Op = Byte1 & 0x0F
-            Length = Byte2 & 0x7F
-            if Length == 126:
-                Ext = self._Recv_Exact(Client, 2)
-                if not Ext:
-                    return None
-                Length = struct.unpack("!H", Ext)[0]
-            elif Length == 127:
-                Ext = self._Recv_Exact(Client, 8)
-                if not Ext:
-                    return None
-                Length = struct.unpack("!Q", Ext)[0]
-            Mask = b""
-            if (Byte2 >> 7) & 1:
-                Mask = self._Recv_Exact(Client, 4)
-                if not Mask:
-                    return None
-            Payload = self._Recv_Exact(Client, Length)
-            if Payload is None:
-                return None
-            if Mask:
-                Payload = bytes(B ^ Mask[i % 4] for i, B in enumerate(Payload))
-            return (Op, Payload)
+        def _Length(self, Data):
+            if isinstance(Data, (tuple, list)):
+                return sum(len(Part) for Part in Data)
+            return len(Data)
 
-        def _Send_Frame(self, Client, Op, Data):
-            Byte1 = 0x80 | (Op & 0x0F)
-            Length = len(Data)
+        def _Frame_Parts(self, Op, Data, Rsv1=False):
+            Byte1 = 0x80 | (0x40 if Rsv1 else 0) | (Op & 0x0F)
+            Length = self._Length(Data)
             if Length < 126:
                 Header = struct.pack("!BB", Byte1, Length)
             elif Length < (1 << 16):
                 Header = struct.pack("!BBH", Byte1, 126, Length)
             else:
                 Header = struct.pack("!BBQ", Byte1, 127, Length)
-            Client.sendall(Header + Data)
\ No newline at end of file
+            if isinstance(Data, (tuple, list)):
+                return (Header,) + tuple(Data)
+            return (Header, Data)
+
+        async def _Send_Frame(self, Client, Op, Data, Framed=False, Rsv1=False):
+            Views = [memoryview(Part) for Part in (Data if Framed else self._Frame_Parts(Op, Data, Rsv1)) if len(Part)]
+            Index, Sent = self._Write_Parts(Client, Views, 0)
+            Last_Progress = time.monotonic()
+            while Index < len(Views):
+                await self._Writable(Client, 1.0)
+                Index, Sent = self._Write_Parts(Client, Views, Index)
+                Now = time.monotonic()
+                if Sent:
+                    Last_Progress = Now
+                elif Now - Last_Progress > self._Timeout:
+                    raise socket.timeout("send stalled")
+
+        def _Write_Parts(self, Client, Views, Index):
+            Total = 0
+            while Index < len(Views):
+                try:
+                    if hasattr(Client, "sendmsg"):
+                        Sent = Client.sendmsg(Views[Index:Index + 512])
+                    else:
+                        Sent = Client.send(Views[Index])
+                except (BlockingIOError, InterruptedError):
+                    return Index, Total
+                Total += Sent
+                while Sent > 0:
+                    Part_Length = len(Views[Index])
+                    if Sent >= Part_Length:
+                        Sent -= Part_Length
+                        Index += 1
+                    else:
+                        Views[Index] = Views[Index][Sent:]
+                        Sent = 0
+            return Index, Total
+
+        async def _Writable(self, Client, Timeout):
+            Future = self._Loop.create_future()
+            File_No = Client.fileno()
+            self._Loop.add_writer(File_No, lambda: Future.done() or Future.set_result(None))
+            try:
+                await asyncio.wait_for(Future, Timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._Loop.remove_writer(File_No)